@@ -0,0 +1,92 @@
+"""Local stand-in for arxiv.org, built from the records saved by task4 (task4arxiv_clean.json).
+
+Serves a listing page at ``/list/<category>/pastweek`` and one abstract page per record at
+``/abs/<id>``, with the same markup scraper.py and task4 look for (h1.title, div.authors,
+div.dateline, blockquote.abstract). ``delay`` adds a fixed per-request latency so the
+benefit of concurrency shows up locally; ``server.hits`` counts requests.
+
+Usage:
+  python arxiv_fixture.py --port 8002              # then: python scraper.py --base-url http://127.0.0.1:8002
+"""
+import argparse
+import html
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_ABS_PAGE = """<!DOCTYPE html>
+<html><head><title>[{id}] {title}</title></head>
+<body><div id="abs">
+<h1 class="title mathjax"><span class="descriptor">Title:</span>{title}</h1>
+<div class="authors"><span class="descriptor">Authors:</span>{authors}</div>
+<div class="dateline">{date}</div>
+<blockquote class="abstract mathjax">
+<span class="descriptor">Abstract:</span>{abstract}
+</blockquote>
+</div></body></html>
+"""
+
+
+def build_pages(records, category='cs.CL'):
+    """{path: html} for the listing and every abstract page."""
+    pages, items = {}, []
+    for rec in records:
+        arxiv_id = rec['url'].rstrip('/').rsplit('/', 1)[-1]
+        authors = ', '.join(f'<a href="/a/{html.escape(a.strip())}">{html.escape(a.strip())}</a>'
+                            for a in rec['authors'].split(','))
+        pages[f'/abs/{arxiv_id}'] = _ABS_PAGE.format(
+            id=arxiv_id, title=html.escape(rec['title']), authors=authors,
+            date=html.escape(rec['date']), abstract=html.escape(rec['abstract']))
+        items.append(f'<dt><a href="/abs/{arxiv_id}" title="Abstract" id="{arxiv_id}">arXiv:{arxiv_id}</a></dt>'
+                     f'<dd><div class="list-title">{html.escape(rec["title"])}</div></dd>')
+    pages[f'/list/{category}/pastweek'] = f'<html><body><dl id="articles">{"".join(items)}</dl></body></html>'
+    return pages
+
+
+def serve(json_path='task4arxiv_clean.json', delay=0.0, port=0):
+    """Start the fixture in a daemon thread; returns (server, base_url)."""
+    with open(json_path, encoding='utf-8') as f:
+        pages = build_pages(json.load(f))
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            server.hits += 1
+            if delay:
+                time.sleep(delay)
+            body = pages.get(self.path.split('?', 1)[0])
+            if body is None:
+                self.send_error(404)
+                return
+            data = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.hits = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--json', default='task4arxiv_clean.json')
+    ap.add_argument('--port', type=int, default=8002)
+    ap.add_argument('--delay', type=float, default=0.0, help='seconds of latency per request')
+    args = ap.parse_args()
+    server, base_url = serve(args.json, args.delay, args.port)
+    print(f"serving {args.json} at {base_url}/list/cs.CL/pastweek")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
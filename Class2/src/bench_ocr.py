@@ -0,0 +1,64 @@
+"""Benchmark OCR throughput: per-call pytesseract vs ocr_engine.
+
+Baseline is what task5 used to do for every page: ``pytesseract.image_to_string`` on one
+image at a time (a new tesseract process and language-data load per page). The engine
+runs the same pages through ``OCREngine`` (persistent Tesseract API per worker process).
+Workers get image paths and decode the PNGs themselves, so decoding is parallel too.
+
+Usage:
+  python bench_ocr.py                          # every PNG under images/
+  python bench_ocr.py --limit 20 --workers 1 4 8
+  python bench_ocr.py --skip-baseline
+"""
+import argparse
+import glob
+import os
+import time
+
+from ocr_engine import OCREngine
+from task5 import custom_oem_psm_config
+
+
+def baseline(paths, config):
+    import pytesseract
+    from PIL import Image
+    for p in paths:
+        pytesseract.image_to_string(Image.open(p), config=config)
+
+
+def engine_run(paths, workers, config):
+    with OCREngine(workers, config=config) as engine:
+        engine.ocr(paths[0])  # start the workers (and load the language data) before timing
+        t0 = time.perf_counter()
+        for _ in engine.imap(paths):
+            pass
+        return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--images', default='images')
+    ap.add_argument('--limit', type=int, default=None)
+    ap.add_argument('--workers', type=int, nargs='*', default=None, help='pool sizes (default: 1 and one per core)')
+    ap.add_argument('--config', default=custom_oem_psm_config)
+    ap.add_argument('--skip-baseline', action='store_true')
+    args = ap.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.images, '**', '*.png'), recursive=True))[:args.limit]
+    if not paths:
+        raise SystemExit(f"no PNGs under {args.images}/")
+    print(f"{len(paths)} pages, {os.cpu_count()} cores")
+
+    if not args.skip_baseline:
+        t0 = time.perf_counter()
+        baseline(paths, args.config)
+        seconds = time.perf_counter() - t0
+        print(f"pytesseract per call : {len(paths) / seconds:6.2f} pages/s ({seconds:.1f}s)")
+
+    for workers in args.workers or sorted({1, os.cpu_count()}):
+        seconds = engine_run(paths, workers, args.config)
+        print(f"engine, {workers:2d} workers   : {len(paths) / seconds:6.2f} pages/s ({seconds:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
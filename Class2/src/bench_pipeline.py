@@ -0,0 +1,97 @@
+"""Benchmark task5's sequential flow against pipeline.py on a local arXiv stand-in.
+
+Serves ``pdfs/`` over HTTP on localhost, then for each mode downloads every PDF from it
+into a scratch directory and OCRs all pages. Both write their own scratch output, so the
+fixture and pdf_ocr/ are left alone. The baseline OCRs the way task5 originally did, one
+pytesseract call per page image in order, not through the ocr_engine process pool.
+
+Usage:
+  python bench_pipeline.py                 # all PDFs in pdfs/
+  python bench_pipeline.py --limit 2 --skip-baseline
+"""
+import argparse
+import functools
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pipeline
+import task5
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve(directory):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(_QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def sequential_images_to_txt(image_paths, out_txt):
+    """task5.images_to_txt before ocr_engine: one pytesseract process per page, in order."""
+    import pytesseract
+    from PIL import Image
+    with open(out_txt, 'w', encoding='utf-8') as f:
+        for i, path in enumerate(image_paths):
+            f.write(f"\n\n---- Page {i+1} ----\n")
+            f.write(pytesseract.image_to_string(Image.open(path), config=task5.custom_oem_psm_config))
+
+
+def baseline(ids, base_url, work):
+    pdf_dir, txt_dir = os.path.join(work, 'pdfs'), os.path.join(work, 'pdf_ocr')
+    os.makedirs(txt_dir, exist_ok=True)
+    pages = 0
+    for arxiv_id in ids:
+        pdf_path = task5.download_pdf(arxiv_id, out_dir=pdf_dir, base_url=base_url)
+        images = task5.pdf_to_images(pdf_path, out_dir=os.path.join(work, 'images', arxiv_id))
+        sequential_images_to_txt(images, os.path.join(txt_dir, f'{arxiv_id}.txt'))
+        pages += len(images)
+    return pages
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--fixture', default='pdfs')
+    ap.add_argument('--limit', type=int, default=None)
+    ap.add_argument('--dpi', type=int, default=300)
+    ap.add_argument('--skip-baseline', action='store_true')
+    ap.add_argument('--no-text-layer', action='store_true', help='pipeline OCRs every page, like the baseline')
+    args = ap.parse_args()
+
+    ids = sorted(f[:-4] for f in os.listdir(args.fixture) if f.endswith('.pdf'))[:args.limit]
+    server, base_url = serve(args.fixture)
+    print(f"{len(ids)} PDFs served from {base_url}, {os.cpu_count()} cores")
+    try:
+        if not args.skip_baseline:
+            work = tempfile.mkdtemp(prefix='bench_seq_')
+            t0 = time.perf_counter()
+            pages = baseline(ids, base_url, work)
+            dt = time.perf_counter() - t0
+            print(f"sequential: {pages} pages in {dt:.1f}s ({pages / dt:.2f} pages/s)")
+            shutil.rmtree(work, ignore_errors=True)
+
+        work = tempfile.mkdtemp(prefix='bench_pipe_')
+        t0 = time.perf_counter()
+        stats = pipeline.run(ids, os.path.join(work, 'pdfs'), os.path.join(work, 'pdf_ocr'), base_url, args.dpi,
+                             use_text_layer=not args.no_text_layer)
+        dt = time.perf_counter() - t0
+        pages = stats['pages'] + stats['text_layer']
+        print(f"pipeline:   {pages} pages in {dt:.1f}s ({pages / dt:.2f} pages/s; "
+              f"{stats['text_layer']} from the text layer, {stats['pages']} OCR'd)")
+
+        t0 = time.perf_counter()
+        stats = pipeline.run(ids, os.path.join(work, 'pdfs'), os.path.join(work, 'pdf_ocr'), base_url, args.dpi)
+        print(f"rerun:      {stats['skipped']} pages served from the page cache in {time.perf_counter() - t0:.2f}s")
+        shutil.rmtree(work, ignore_errors=True)
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
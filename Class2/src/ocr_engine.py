@@ -0,0 +1,167 @@
+"""Reusable OCR engine: a process pool whose workers each keep one Tesseract API open.
+
+pytesseract.image_to_string starts a ``tesseract`` process for every call, writes the
+image to a temp file and loads the language data again. Here each worker process creates
+one tesserocr ``PyTessBaseAPI`` when it starts (language data loaded once) and is handed
+images directly: numpy arrays, PIL images, or paths it opens itself. Every worker runs
+with OMP_THREAD_LIMIT=1, so N workers use N cores instead of N x OpenMP threads.
+Without tesserocr installed the workers fall back to pytesseract.
+
+Usage:
+    with OCREngine(workers=4, config='--oem 3 --psm 1') as engine:
+        text = engine.ocr(image)
+        for text in engine.imap(images):   # bounded read-ahead, results in order
+            ...
+        fut = engine.submit_rendered(render, text)  # render(text) -> image, run in the worker
+
+``workers=0`` runs in-process (no pool), for one-off scripts. ``get_engine()`` returns a
+shared engine sized by OCR_WORKERS (default: one per core).
+"""
+import atexit
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+DEFAULT_CONFIG = r'--oem 3 --psm 1'
+
+_api = None       # per-process tesserocr handle
+_fallback = None  # (lang, config) for pytesseract when tesserocr is missing
+
+
+def parse_config(config):
+    """'--oem 3 --psm 1 -c name=value' -> (oem, psm, {name: value})."""
+    oem = re.search(r'--oem\s+(\d+)', config or '')
+    psm = re.search(r'--psm\s+(\d+)', config or '')
+    variables = dict(re.findall(r'-c\s+(\w+)=(\S+)', config or ''))
+    return (int(oem.group(1)) if oem else None, int(psm.group(1)) if psm else None, variables)
+
+
+def _init_worker(lang, config, tesseract_cmd=None, single_thread=True):
+    global _api, _fallback
+    if single_thread:
+        os.environ['OMP_THREAD_LIMIT'] = '1'  # before tesseract is loaded
+    try:
+        import tesserocr
+    except ImportError:
+        import pytesseract
+        if tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+        _fallback = (lang, config)
+        return
+    oem, psm, variables = parse_config(config)
+    kwargs = {'lang': lang}
+    if oem is not None:
+        kwargs['oem'] = tesserocr.OEM(oem)
+    if psm is not None:
+        kwargs['psm'] = tesserocr.PSM(psm)
+    _api = tesserocr.PyTessBaseAPI(**kwargs)
+    for name, value in variables.items():
+        _api.SetVariable(name, value)
+
+
+def _to_pil(image):
+    from PIL import Image
+    if isinstance(image, str):
+        return Image.open(image)
+    if isinstance(image, Image.Image):
+        return image
+    return Image.fromarray(image)  # numpy array (H, W) or (H, W, 3)
+
+
+def _ocr(image):
+    image = _to_pil(image)
+    if _api is None:
+        import pytesseract
+        lang, config = _fallback
+        return pytesseract.image_to_string(image, lang=lang, config=config)
+    _api.SetImage(image)
+    return _api.GetUTF8Text()
+
+
+def _render_ocr(render, args):
+    return _ocr(render(*args))
+
+
+class OCREngine:
+    def __init__(self, workers=None, lang='eng', config=DEFAULT_CONFIG, tesseract_cmd=None):
+        self.workers = os.cpu_count() if workers is None else workers
+        self.lang = lang
+        self.config = config
+        if self.workers > 0:
+            self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                             initargs=(lang, config, tesseract_cmd))
+        else:
+            self._pool = None
+            _init_worker(lang, config, tesseract_cmd, single_thread=False)
+
+    def _submit(self, fn, *args):
+        if self._pool is not None:
+            return self._pool.submit(fn, *args)
+        fut = Future()
+        try:
+            fut.set_result(fn(*args))
+        except Exception as e:
+            fut.set_exception(e)
+        return fut
+
+    def submit(self, image):
+        """Future of the text of one image."""
+        return self._submit(_ocr, image)
+
+    def submit_rendered(self, render, *args):
+        """Future of the text of ``render(*args)``, an image produced inside the worker.
+
+        ``render`` must be a module-level function; only its arguments and the text cross
+        process boundaries, never the image.
+        """
+        return self._submit(_render_ocr, render, args)
+
+    def ocr(self, image):
+        return self.submit(image).result()
+
+    def imap(self, images, prefetch=None):
+        """Texts of ``images`` in order, with at most ``prefetch`` images in flight.
+
+        Unlike Executor.map this doesn't consume the whole iterable up front, so a page
+        generator stays lazy and memory stays bounded.
+        """
+        prefetch = prefetch or 2 * max(1, self.workers)
+        pending = deque()
+        for image in images:
+            pending.append(self.submit(image))
+            if len(pending) >= prefetch:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_ENGINES = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def get_engine(lang='eng', config=DEFAULT_CONFIG, tesseract_cmd=None):
+    """Shared engine per (lang, config), created on first use and closed at exit."""
+    key = (lang, config)
+    with _ENGINES_LOCK:
+        if key not in _ENGINES:
+            workers = int(os.environ.get('OCR_WORKERS', os.cpu_count()))
+            _ENGINES[key] = OCREngine(workers, lang, config, tesseract_cmd)
+        return _ENGINES[key]
+
+
+@atexit.register
+def _close_all():
+    for engine in _ENGINES.values():
+        engine.close()
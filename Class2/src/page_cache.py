@@ -0,0 +1,140 @@
+"""Per-page text cache for the arXiv OCR corpus, in one SQLite file.
+
+A page is keyed by (sha256 of the PDF bytes, page number, dpi, OCR key), so a rerun
+only recomputes pages whose key changed: a re-downloaded PDF with new content, a different
+--dpi, a different tesseract config or render mode. The OCR key is the config plus the
+render mode (``ocr_key``), since the pipeline OCRs grayscale pages and task5 color ones.
+Pages taken from the PDF text layer are stored with dpi 0 and a key that records the
+text-layer thresholds (``text_layer_key``), so they survive dpi/config changes but not a
+change of TEXT_LAYER_MIN_CHARS / TEXT_LAYER_MAX_GARBAGE.
+A ``papers`` table records which arXiv ids are finished, for ``--since``.
+
+Usage:
+    cache = PageCache('pdf_ocr/cache.sqlite')
+    sha = file_sha256(pdf_path)
+    key = ocr_key(config, grayscale=True)
+    texts, todo, cached = resolve(cache, pdf_path, sha, n_pages, dpi, key)  # todo: pages to OCR
+    cache.put(sha, page, dpi, key, text)
+    cache.paper_done(arxiv_id, sha, n_pages)
+    ids = cache.new_ids(ids)            # not finished in an earlier run
+    ids = cache.new_ids(ids, '2507.19521')  # newer than this id
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from text_layer import MAX_GARBAGE, MIN_CHARS, split_pages
+
+CACHE_FILE = 'cache.sqlite'  # under the txt dir
+TEXT_LAYER = 'text_layer'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    sha256 TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    dpi INTEGER NOT NULL,
+    config TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (sha256, page, dpi, config)
+);
+CREATE TABLE IF NOT EXISTS papers (
+    arxiv_id TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    n_pages INTEGER NOT NULL,
+    done REAL NOT NULL
+);
+"""
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def ocr_key(config, grayscale):
+    """Cache key of an OCR result: tesseract config + render mode."""
+    return f"{config}|{'gray' if grayscale else 'rgb'}"
+
+
+def text_layer_key(min_chars=MIN_CHARS, max_garbage=MAX_GARBAGE):
+    """Cache key of a text-layer page; pages accepted under other thresholds don't match."""
+    return f'{TEXT_LAYER}|{min_chars}|{max_garbage}'
+
+
+def id_key(arxiv_id):
+    """Sortable key of a new-style arXiv id: '2507.19511v2' -> (2507, 19511)."""
+    return tuple(int(x) for x in re.sub(r'v\d+$', '', arxiv_id).split('.'))
+
+
+class PageCache:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # One connection shared by the pipeline's threads, serialized by the lock.
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def texts(self, sha, dpi, config, text_layer=None):
+        """{page: text} of every cached page of this PDF under (dpi, config).
+
+        Pages stored under the ``text_layer`` key count too (None: skip them); they win over OCR.
+        """
+        keys = [(dpi, config)] + ([(0, text_layer)] if text_layer else [])
+        marks = ' OR '.join('(dpi = ? AND config = ?)' for _ in keys)
+        with self._lock:
+            rows = self._db.execute(
+                f'SELECT page, text FROM pages WHERE sha256 = ? AND ({marks}) ORDER BY config = ?',
+                [sha, *(v for key in keys for v in key), text_layer]).fetchall()
+        return dict(rows)
+
+    def put(self, sha, page, dpi, config, text):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)',
+                             (sha, page, dpi, config, text, time.time()))
+
+    def paper_done(self, arxiv_id, sha, n_pages):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO papers VALUES (?, ?, ?, ?)',
+                             (arxiv_id, sha, n_pages, time.time()))
+
+    def done_ids(self):
+        with self._lock:
+            return {row[0] for row in self._db.execute('SELECT arxiv_id FROM papers')}
+
+    def new_ids(self, arxiv_ids, since=None):
+        """Ids newer than ``since``, or (since=None) the ones not finished in an earlier run."""
+        if since:
+            return [i for i in arxiv_ids if id_key(i) > id_key(since)]
+        done = self.done_ids()
+        return [i for i in arxiv_ids if i not in done]
+
+    def close(self):
+        self._db.close()
+
+
+def resolve(cache, pdf_path, sha, n_pages, dpi, config, use_text_layer=True, poppler_path=None):
+    """({page: text} already known, [pages still to OCR], how many came from the cache).
+
+    ``config`` is the OCR key (``ocr_key``). Cached pages come first; of the rest, pages
+    that pass the text-layer check are read with pdftotext and cached on the spot.
+    """
+    layer_key = text_layer_key() if use_text_layer else None
+    texts = cache.texts(sha, dpi, config, text_layer=layer_key)
+    cached = len(texts)
+    todo = [p for p in range(1, n_pages + 1) if p not in texts]
+    if todo and use_text_layer:
+        layer, _ = split_pages(pdf_path, poppler_path)
+        for page in todo:
+            if page in layer:
+                cache.put(sha, page, 0, layer_key, layer[page])
+                texts[page] = layer[page]
+        todo = [p for p in todo if p not in texts]
+    return texts, todo, cached
@@ -0,0 +1,219 @@
+"""Parallel, resumable arXiv PDF -> text pipeline (task5 at batch scale).
+
+    download (threads, pooled requests.Session)
+      -> text layer (pdftotext; pages that pass text_layer's quality check are done here)
+      -> rasterize (threads, remaining pages one at a time, pdftoppm runs outside the GIL)
+      -> OCR (ocr_engine: process pool, one persistent Tesseract API per core)
+
+Stages are connected by bounded queues, so a slow stage applies back-pressure instead of
+piling rendered pages up in memory. Every finished page goes into the page cache
+(``<txt_dir>/cache.sqlite``, see page_cache.py) keyed by PDF hash, page, dpi and OCR
+config plus render mode; a rerun only redoes pages whose key isn't there. Once all pages
+of a paper are done, ``<txt_dir>/<id>.txt`` is written in the same "---- Page i ----" format as task5
+(left alone when every page came from the cache and the file exists).
+
+Usage:
+  python pipeline.py --latest 5                      # newest cs.CL papers
+  python pipeline.py --ids 2507.19511 2507.19521
+  python pipeline.py --latest 50 --since             # only ids not finished by an earlier run
+  python pipeline.py --latest 50 --since 2507.19521  # only ids newer than this one
+  python -m http.server -d pdfs 8001 &               # local stand-in for arxiv.org
+  python pipeline.py --ids 2507.19511 --base-url http://127.0.0.1:8001 --pdf-dir /tmp/pdfs
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ocr_engine import OCREngine
+from page_cache import CACHE_FILE, PageCache, file_sha256, ocr_key, resolve
+from task5 import POPPLER_PATH, custom_oem_psm_config as OCR_CONFIG, get_latest_arxiv_ids, iter_pdf_pages, pdf_page_count
+
+_DONE = object()  # end-of-stream marker between stages
+
+
+def make_session(pool_size):
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=1.0, status_forcelist=(429, 500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def download(session, arxiv_id, pdf_dir, base_url):
+    pdf_path = os.path.join(pdf_dir, f'{arxiv_id}.pdf')
+    if os.path.exists(pdf_path) and os.path.getsize(pdf_path) > 0:
+        return pdf_path
+    tmp = f'{pdf_path}.part'
+    with session.get(f'{base_url}/{arxiv_id}.pdf', stream=True, timeout=60) as r:
+        r.raise_for_status()
+        with open(tmp, 'wb') as f:
+            for chunk in r.iter_content(1 << 16):
+                f.write(chunk)
+    os.replace(tmp, pdf_path)  # a crash never leaves a truncated PDF behind
+    return pdf_path
+
+
+def write_txt(texts, arxiv_id, txt_dir):
+    out_txt = os.path.join(txt_dir, f'{arxiv_id}.txt')
+    with open(out_txt, 'w', encoding='utf-8') as f:
+        for page in sorted(texts):
+            f.write(f"\n\n---- Page {page} ----\n")
+            f.write(texts[page])
+    return out_txt
+
+
+def run(arxiv_ids, pdf_dir='pdfs', txt_dir='pdf_ocr', base_url='https://arxiv.org/pdf', dpi=300,
+        download_workers=4, render_workers=None, ocr_workers=None, config=OCR_CONFIG, use_text_layer=True):
+    os.makedirs(pdf_dir, exist_ok=True)
+    os.makedirs(txt_dir, exist_ok=True)
+    ocr_workers = ocr_workers or os.cpu_count()
+    render_workers = render_workers or max(1, ocr_workers // 4)
+    cache = PageCache(os.path.join(txt_dir, CACHE_FILE))
+    key = ocr_key(config, grayscale=True)  # pages are rendered grayscale below
+    pdf_q = queue.Queue(maxsize=2 * render_workers)
+    page_q = queue.Queue(maxsize=2 * ocr_workers)  # rendered pages waiting for OCR: bounds memory
+    remaining = {}  # arxiv_id -> pages still to OCR
+    papers = {}     # arxiv_id -> (sha256, n_pages, {page: text})
+    lock = threading.Lock()
+    stats = {'papers': 0, 'pages': 0, 'text_layer': 0, 'skipped': 0, 'failed': 0}
+
+    def finish_paper(arxiv_id):
+        sha, pages, texts = papers[arxiv_id]
+        out_txt = write_txt(texts, arxiv_id, txt_dir)
+        cache.paper_done(arxiv_id, sha, pages)
+        return out_txt
+
+    def finish_page(arxiv_id, page, text):
+        with lock:
+            papers[arxiv_id][2][page] = text
+            remaining[arxiv_id] -= 1
+            complete = remaining[arxiv_id] == 0
+        if complete:
+            print(f"OCR done: {finish_paper(arxiv_id)}")
+
+    def downloader():
+        session = make_session(download_workers)
+        with ThreadPoolExecutor(download_workers, thread_name_prefix='download') as pool:
+            futures = [(i, pool.submit(download, session, i, pdf_dir, base_url)) for i in arxiv_ids]
+            for arxiv_id, fut in futures:
+                try:
+                    pdf_q.put((arxiv_id, fut.result()))
+                except Exception as e:
+                    print(f"download failed: {arxiv_id}: {e}")
+        for _ in range(render_workers):
+            pdf_q.put(_DONE)
+
+    def renderer():
+        while True:
+            item = pdf_q.get()
+            if item is _DONE:
+                page_q.put(_DONE)
+                return
+            arxiv_id, pdf_path = item
+            try:
+                pages = pdf_page_count(pdf_path)
+                sha = file_sha256(pdf_path)
+            except Exception as e:
+                print(f"unreadable PDF: {pdf_path}: {e}")
+                continue
+            # Cached pages, then born-digital pages straight from pdftotext; only the rest get rendered.
+            texts, todo, cached = resolve(cache, pdf_path, sha, pages, dpi, key, use_text_layer, POPPLER_PATH)
+            with lock:
+                papers[arxiv_id] = (sha, pages, texts)
+                remaining[arxiv_id] = len(todo)
+                stats['papers'] += 1
+                stats['skipped'] += cached
+                stats['text_layer'] += len(texts) - cached
+            if not todo:
+                if cached < pages or not os.path.exists(os.path.join(txt_dir, f'{arxiv_id}.txt')):
+                    finish_paper(arxiv_id)
+                else:
+                    cache.paper_done(arxiv_id, sha, pages)
+                continue
+            try:
+                # One page in memory per renderer; the bounded queue holds the rest back.
+                for page, image in iter_pdf_pages(pdf_path, dpi, pages=todo, grayscale=True):
+                    page_q.put((arxiv_id, sha, page, image))
+            except Exception as e:
+                print(f"render failed: {arxiv_id}: {e}")
+                with lock:
+                    stats['failed'] += 1
+
+    threads = [threading.Thread(target=downloader, name='downloader', daemon=True)]
+    threads += [threading.Thread(target=renderer, name=f'render-{i}', daemon=True) for i in range(render_workers)]
+    for t in threads:
+        t.start()
+
+    t0 = time.perf_counter()
+    inflight = threading.BoundedSemaphore(2 * ocr_workers)
+    with OCREngine(ocr_workers, config=config) as engine:
+        def on_done(fut, arxiv_id, sha, page):
+            inflight.release()
+            try:
+                text = fut.result()
+                cache.put(sha, page, dpi, key, text)
+            except Exception as e:
+                print(f"OCR failed: {arxiv_id} page {page}: {e}")
+                with lock:
+                    stats['failed'] += 1
+                return
+            with lock:
+                stats['pages'] += 1
+            finish_page(arxiv_id, page, text)
+
+        finished_renderers = 0
+        while finished_renderers < render_workers:
+            item = page_q.get()
+            if item is _DONE:
+                finished_renderers += 1
+                continue
+            arxiv_id, sha, page, image = item
+            inflight.acquire()
+            fut = engine.submit(image)
+            fut.add_done_callback(lambda f, a=arxiv_id, s=sha, p=page: on_done(f, a, s, p))
+    cache.close()
+    stats['seconds'] = time.perf_counter() - t0
+    return stats
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--ids', nargs='*', default=None, help='arXiv ids (default: --latest from the listing)')
+    ap.add_argument('--latest', type=int, default=5)
+    ap.add_argument('--category', default='cs.CL')
+    ap.add_argument('--base-url', default='https://arxiv.org/pdf')
+    ap.add_argument('--pdf-dir', default='pdfs')
+    ap.add_argument('--txt-dir', default='pdf_ocr')
+    ap.add_argument('--dpi', type=int, default=300)
+    ap.add_argument('--download-workers', type=int, default=4)
+    ap.add_argument('--render-workers', type=int, default=None)
+    ap.add_argument('--ocr-workers', type=int, default=None, help='default: one per core')
+    ap.add_argument('--no-text-layer', action='store_true', help='OCR every page, even born-digital ones')
+    ap.add_argument('--since', nargs='?', const='', default=None, metavar='ID',
+                    help='only ids newer than ID; without ID, only ids not finished by an earlier run')
+    args = ap.parse_args()
+
+    ids = args.ids or get_latest_arxiv_ids(args.category, args.latest)
+    if args.since is not None:
+        cache = PageCache(os.path.join(args.txt_dir, CACHE_FILE))
+        ids = cache.new_ids(ids, args.since)
+        cache.close()
+        print(f"{len(ids)} new ids: {' '.join(ids)}")
+    stats = run(ids, args.pdf_dir, args.txt_dir, args.base_url, args.dpi,
+                args.download_workers, args.render_workers, args.ocr_workers,
+                use_text_layer=not args.no_text_layer)
+    rate = stats['pages'] / stats['seconds'] if stats['seconds'] else 0.0
+    print(f"{stats['papers']} papers, {stats['pages']} pages OCR'd ({rate:.2f} pages/s), "
+          f"{stats['text_layer']} from the text layer, {stats['skipped']} from the cache, {stats['failed']} failed, {stats['seconds']:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""OCR evaluation without a browser: render abstracts with PIL, OCR them, score with CER.
+
+task4 opens each abstract page in headless Chrome to screenshot it, then OCRs the image
+into ``ocr_abstract``. This script draws each record's extracted ``abstract`` text to a
+grayscale image in-process instead, using a TrueType font, a font size and a page width
+that you can configure. Rendering and OCR both happen in the ocr_engine worker processes
+(``submit_rendered``), so only the text crosses a process boundary.
+
+Every record is rendered once per variant (every font x size x width combination).
+Character error rate, CER = edit distance / reference length (whitespace collapsed), is
+computed for the whole dataset in one batch: a numpy Levenshtein that advances one
+reference character per step for all records at once. The insertion chain inside a row
+is solved with a running minimum, so there is no Python loop over the hypothesis. The
+CER of the browser screenshots (the existing ``ocr_abstract``) is reported alongside.
+
+Usage:
+  python render_abstracts.py                                    # task4arxiv_clean.json, default font
+  python render_abstracts.py --fonts DejaVuSans.ttf DejaVuSerif.ttf --sizes 14 18 --widths 600 900
+  python render_abstracts.py --repeat 200 --workers 8           # throughput on a larger set
+"""
+import argparse
+import functools
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from ocr_engine import OCREngine
+
+
+@functools.lru_cache(maxsize=32)
+def _font(path, size):
+    # loaded once per worker process and (font, size)
+    return ImageFont.truetype(path, size) if path else ImageFont.load_default(size)
+
+
+def wrap(text, font, width):
+    """Greedy word wrap of ``text`` to lines no wider than ``width`` pixels."""
+    lines = []
+    for paragraph in text.split('\n'):
+        line = ''
+        for word in paragraph.split():
+            candidate = f'{line} {word}' if line else word
+            if line and font.getlength(candidate) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+def render_text(text, font_path=None, size=16, width=800, margin=20, spacing=4):
+    """Black-on-white 'L' image of ``text`` wrapped to ``width`` pixels (plus margins)."""
+    font = _font(font_path, size)
+    lines = wrap(text, font, width - 2 * margin)
+    ascent, descent = font.getmetrics()
+    line_h = ascent + descent + spacing
+    image = Image.new('L', (width, 2 * margin + line_h * len(lines)), 255)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((margin, margin + i * line_h), line, font=font, fill=0)
+    return image
+
+
+def normalize(text):
+    return ' '.join(text.split())
+
+
+def _codes(texts, pad):
+    """(len(texts), max_len) uint32 code points padded with ``pad``, and the lengths."""
+    lens = np.array([len(t) for t in texts], dtype=np.int64)
+    out = np.full((len(texts), max(1, lens.max(initial=0))), pad, dtype=np.uint32)
+    for row, t in enumerate(texts):
+        out[row, :len(t)] = np.frombuffer(t.encode('utf-32-le'), dtype=np.uint32)
+    return out, lens
+
+
+def edit_distances(refs, hyps, batch=256):
+    """Levenshtein distance of every (ref, hyp) pair, all pairs of a batch in lockstep.
+
+    Row i of the DP table depends on row i-1 (deletion, substitution) and on itself
+    (insertion: d[j] = min(d[j], d[j-1] + 1)). The second part is a running minimum:
+    d[j] = j + min(t[k] - k for k <= j), computed with np.minimum.accumulate.
+    """
+    dist = np.array([len(h) for h in hyps], dtype=np.int64)  # empty refs: all insertions
+    order = np.argsort([len(r) for r in refs], kind='stable')  # similar lengths share a batch
+    for start in range(0, len(order), batch):
+        idx = order[start:start + batch]
+        a, a_len = _codes([refs[i] for i in idx], 0xFFFFFFFF)
+        b, b_len = _codes([hyps[i] for i in idx], 0xFFFFFFFE)
+        cols = np.arange(b.shape[1] + 1, dtype=np.int32)
+        row = np.broadcast_to(cols, (len(idx), len(cols))).copy()  # d(0, j) = j
+        t = np.empty_like(row)
+        cost = np.empty(b.shape, dtype=np.int32)
+        for i in range(int(a_len.max(initial=0))):
+            np.not_equal(b, a[:, i:i + 1], out=cost)
+            cost += row[:, :-1]                           # substitution
+            t[:, 0] = i + 1
+            np.add(row[:, 1:], 1, out=t[:, 1:])           # deletion
+            np.minimum(t[:, 1:], cost, out=t[:, 1:])
+            t -= cols
+            np.minimum.accumulate(t, axis=1, out=row)     # insertion
+            row += cols
+            done = np.flatnonzero(a_len == i + 1)         # refs ending here: read off the answer
+            if len(done):
+                dist[idx[done]] = row[done, b_len[done]]
+    return dist
+
+
+def cer_stats(refs, hyps):
+    refs = [normalize(r) for r in refs]
+    hyps = [normalize(h) for h in hyps]
+    dist = edit_distances(refs, hyps)
+    lens = np.array([max(1, len(r)) for r in refs])
+    cer = dist / lens
+    return {
+        'n': len(refs),
+        'cer_mean': float(cer.mean()) if len(cer) else 0.0,
+        'cer_micro': float(dist.sum() / lens.sum()) if len(cer) else 0.0,
+        'cer_p50': float(np.median(cer)) if len(cer) else 0.0,
+        'cer_p90': float(np.percentile(cer, 90)) if len(cer) else 0.0,
+        'exact': float((dist == 0).mean()) if len(cer) else 0.0,
+    }, cer
+
+
+def _fmt(stats):
+    return (f"CER mean {stats['cer_mean']:.4f}  micro {stats['cer_micro']:.4f}  p50 {stats['cer_p50']:.4f}  "
+            f"p90 {stats['cer_p90']:.4f}  exact {stats['exact']:.1%}  (n={stats['n']})")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--json', default='task4arxiv_clean.json')
+    ap.add_argument('--out', default='arxiv_rendered.json')
+    ap.add_argument('--fonts', nargs='*', default=[None], help='TrueType files (default: PIL built-in font)')
+    ap.add_argument('--sizes', type=int, nargs='*', default=[16])
+    ap.add_argument('--widths', type=int, nargs='*', default=[800], help='image width in pixels')
+    ap.add_argument('--workers', type=int, default=None, help='default: one per core')
+    ap.add_argument('--config', default='', help='tesseract config (task4 uses the default)')
+    ap.add_argument('--repeat', type=int, default=1, help='repeat the records, for throughput runs')
+    args = ap.parse_args()
+
+    with open(args.json, encoding='utf-8') as f:
+        records = json.load(f) * args.repeat
+    variants = list(itertools.product(args.fonts, args.sizes, args.widths))
+
+    if any('ocr_abstract' in r for r in records):
+        shots = [r for r in records if 'ocr_abstract' in r]
+        stats, _ = cer_stats([r['abstract'] for r in shots], [r['ocr_abstract'] for r in shots])
+        print(f"browser screenshots     : {_fmt(stats)}")
+
+    out = []
+    with OCREngine(args.workers, config=args.config) as engine:
+        for font, size, width in variants:
+            t0 = time.perf_counter()
+            futures = [engine.submit_rendered(render_text, r['abstract'], font, size, width) for r in records]
+            texts = [fut.result() for fut in futures]
+            dt = time.perf_counter() - t0
+            stats, cer = cer_stats([r['abstract'] for r in records], texts)
+            name = os.path.basename(font) if font else 'default'
+            print(f"{name} {size}px w={width}: {_fmt(stats)}  [{len(records) / dt * 60:.0f} records/min]")
+            for r, text, c in zip(records, texts, cer):
+                out.append(dict(r, ocr_abstract=text.strip(), cer=round(float(c), 4),
+                                render={'font': name, 'size': size, 'width': width}))
+
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(out, f, ensure_ascii=False, indent=2)
+    print(f"-> {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+"""Async arXiv abstract scraper: task4 without a Selenium page load per paper.
+
+One httpx.AsyncClient (shared connection pool) fetches the listing and the abstract
+pages concurrently, paced by a token bucket so the request rate stays within arXiv's
+limits (default: one request every 3 s, the rate arXiv asks crawlers to keep to). Each
+page is fetched once and parsed once with the fastest parser available: selectolax,
+then lxml, then BeautifulSoup's html.parser.
+
+Screenshots are optional (``--screenshots N``). They run in a fixed pool of N reusable
+Playwright browser contexts. The already-fetched HTML is rendered with set_content, so
+taking a screenshot doesn't request the page again. The stylesheets, scripts and images
+it refers to are intercepted: each one is fetched once through the same client and token
+bucket and then served from memory, so the browser never bypasses the rate limit. With
+``--ocr``, the screenshots go through ocr_engine, like task4's ocr_abstract.
+
+Usage:
+  python scraper.py                                   # 10 newest cs.CL papers -> arxiv_clean.json
+  python scraper.py --limit 50 --screenshots 2 --ocr
+  python scraper.py --fixture --rate 20 --burst 5     # offline, against arxiv_fixture.py
+"""
+import argparse
+import asyncio
+import contextlib
+import email.utils
+import json
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+
+import httpx
+
+LISTING = '/list/{category}/pastweek?show=250'
+# field -> (tag, class, label task4 strips from the text)
+FIELDS = {
+    'title': ('h1', 'title', 'Title:'),
+    'authors': ('div', 'authors', 'Authors:'),
+    'date': ('div', 'dateline', ''),
+    'abstract': ('blockquote', 'abstract', 'Abstract:'),
+}
+
+
+def _parse_selectolax(html):
+    from selectolax.parser import HTMLParser
+    tree = HTMLParser(html)
+    texts = {}
+    for field, (tag, cls, _) in FIELDS.items():
+        node = tree.css_first(f'{tag}.{cls}')
+        texts[field] = node.text() if node else ''
+    return texts, [n.attributes.get('href') for n in tree.css('a[title="Abstract"]')]
+
+
+def _parse_lxml(html):
+    import lxml.html
+    tree = lxml.html.fromstring(html)
+    texts = {}
+    for field, (tag, cls, _) in FIELDS.items():
+        nodes = tree.xpath(f"//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')]")
+        texts[field] = nodes[0].text_content() if nodes else ''
+    return texts, tree.xpath('//a[@title="Abstract"]/@href')
+
+
+def _parse_bs4(html):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    texts = {}
+    for field, (tag, cls, _) in FIELDS.items():
+        node = soup.find(tag, class_=cls)
+        texts[field] = node.text if node else ''
+    return texts, [a['href'] for a in soup.find_all('a', title='Abstract')]
+
+
+def _pick_parser():
+    for name, module, parse in (('selectolax', 'selectolax.parser', _parse_selectolax),
+                                ('lxml', 'lxml.html', _parse_lxml),
+                                ('html.parser', 'bs4', _parse_bs4)):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        return name, parse
+    raise ImportError('need selectolax, lxml or beautifulsoup4')
+
+
+PARSER, _parse = _pick_parser()
+
+
+def parse_abs(html):
+    """title/authors/date/abstract of an abstract page, cleaned the way task4 does."""
+    texts, _ = _parse(html)
+    return {field: texts[field].replace(label, '', 1).strip() if label else texts[field].strip()
+            for field, (_, _, label) in FIELDS.items()}
+
+
+def parse_listing(html, base_url):
+    _, hrefs = _parse(html)
+    return [href if href.startswith('http') else base_url + href for href in hrefs]
+
+
+class TokenBucket:
+    """``rate`` tokens per second, up to ``burst`` saved up; acquire() waits for one."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._t = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:  # waiters are served in order
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._t) * self.rate)
+                self._t = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def retry_after(value, default):
+    """Seconds to wait for a Retry-After header, which is either seconds or an HTTP-date."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+async def get(client, bucket, url, retries=3):
+    for attempt in range(retries + 1):
+        await bucket.acquire()
+        r = await client.get(url)
+        if r.status_code in (429, 503) and attempt < retries:
+            # arXiv says how long to back off; otherwise back off exponentially
+            await asyncio.sleep(retry_after(r.headers.get('Retry-After'), 2 ** attempt))
+            continue
+        r.raise_for_status()
+        return r
+
+
+async def fetch(client, bucket, url, retries=3):
+    return (await get(client, bucket, url, retries)).text
+
+
+class ScreenshotPool:
+    """N browser contexts (one page each) from one headless Chromium, reused for every shot.
+
+    Every request the browser makes is routed: fetched once via ``client`` and ``bucket``
+    and cached, or aborted when no client is given.
+    """
+
+    def __init__(self, contexts=2, viewport=(800, 900), client=None, bucket=None):
+        self.n = contexts
+        self.viewport = {'width': viewport[0], 'height': viewport[1]}
+        self._client = client
+        self._bucket = bucket
+        self._assets = {}  # url -> task of the response, shared by every page
+
+    async def __aenter__(self):
+        from playwright.async_api import async_playwright
+        self._pw = await async_playwright().start()
+        self._browser = await self._pw.chromium.launch()
+        self._free = asyncio.Queue()
+        for _ in range(self.n):
+            context = await self._browser.new_context(viewport=self.viewport)
+            await context.route('**/*', self._route)
+            await self._free.put(await context.new_page())
+        return self
+
+    async def _route(self, route):
+        url = route.request.url
+        if self._client is None:
+            await route.abort()
+            return
+        if url not in self._assets:
+            self._assets[url] = asyncio.ensure_future(get(self._client, self._bucket, url))
+        try:
+            r = await self._assets[url]
+        except Exception:
+            await route.abort()
+            return
+        await route.fulfill(status=r.status_code, content_type=r.headers.get('content-type'), body=r.content)
+
+    async def screenshot(self, url, html, selector='blockquote.abstract'):
+        """PNG of ``selector`` in ``html`` (relative links resolved against ``url``)."""
+        page = await self._free.get()
+        try:
+            head = f'<base href="{url}">'
+            html = html.replace('<head>', '<head>' + head, 1) if '<head>' in html else head + html
+            await page.set_content(html, wait_until='load')
+            element = await page.wait_for_selector(selector)
+            return await element.screenshot()
+        finally:
+            self._free.put_nowait(page)
+
+    async def __aexit__(self, *exc):
+        await self._browser.close()
+        await self._pw.stop()
+
+
+async def scrape(base_url='https://arxiv.org', category='cs.CL', limit=10, rate=1 / 3, burst=1,
+                 concurrency=4, screenshots=0, ocr=False):
+    """task4 records ({url, title, authors, date, abstract[, ocr_abstract]}) and failures."""
+    bucket = TokenBucket(rate, burst)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {'User-Agent': 'arxiv-abstract-scraper (homework; polite rate)'}
+    async with contextlib.AsyncExitStack() as stack:
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(limits=limits, headers=headers, timeout=30, follow_redirects=True))
+        shots = await stack.enter_async_context(ScreenshotPool(screenshots, client=client, bucket=bucket)) if screenshots else None
+        listing = await fetch(client, bucket, base_url + LISTING.format(category=category))
+        urls = parse_listing(listing, base_url)[:limit]
+        engine = None
+        if ocr:
+            from ocr_engine import get_engine
+            engine = get_engine(config='')
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(url):
+            async with sem:
+                html = await fetch(client, bucket, url)
+            record = {'url': url, **parse_abs(html)}
+            if shots is not None:
+                png = await shots.screenshot(url, html)
+                if engine is not None:
+                    from PIL import Image
+                    text = await asyncio.wrap_future(engine.submit(Image.open(BytesIO(png))))
+                    record['ocr_abstract'] = text.strip()
+            return record
+
+        results = await asyncio.gather(*(one(u) for u in urls), return_exceptions=True)
+    records = [r for r in results if not isinstance(r, BaseException)]
+    failed = [(u, r) for u, r in zip(urls, results) if isinstance(r, BaseException)]
+    return records, failed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--base-url', default='https://arxiv.org')
+    ap.add_argument('--category', default='cs.CL')
+    ap.add_argument('--limit', type=int, default=10)
+    ap.add_argument('--rate', type=float, default=1 / 3, help='requests per second')
+    ap.add_argument('--burst', type=int, default=1)
+    ap.add_argument('--concurrency', type=int, default=4, help='requests in flight (= pool size)')
+    ap.add_argument('--screenshots', type=int, default=0, metavar='N', help='browser contexts; 0 = no screenshots')
+    ap.add_argument('--ocr', action='store_true', help='OCR the screenshots (needs --screenshots)')
+    ap.add_argument('--fixture', action='store_true', help='serve task4arxiv_clean.json locally and scrape that')
+    ap.add_argument('--fixture-delay', type=float, default=0.2, help='per-request latency of the fixture')
+    ap.add_argument('--out', default='arxiv_clean.json')
+    args = ap.parse_args()
+
+    server = None
+    if args.fixture:
+        from arxiv_fixture import serve
+        server, args.base_url = serve(delay=args.fixture_delay)
+    t0 = time.perf_counter()
+    try:
+        records, failed = asyncio.run(scrape(args.base_url, args.category, args.limit, args.rate, args.burst,
+                                             args.concurrency, args.screenshots, args.ocr))
+    finally:
+        if server is not None:
+            server.shutdown()
+    dt = time.perf_counter() - t0
+    for url, e in failed:
+        print(f"failed: {url}: {e!r}")
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    print(f"{len(records)} papers in {dt:.1f}s ({len(records) / dt:.2f} papers/s, parser: {PARSER}) -> {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,12 @@
 
 from PIL import Image
-import pytesseract #pip install pytesseract first
+from ocr_engine import OCREngine  # tesserocr 常驻 API；没装 tesserocr 时退回 pytesseract
 
 # Load an image using Pillow (PIL)
 image = Image.open('task2.png')
 
-# Perform OCR on the image
-text = pytesseract.image_to_string(image)
+# Perform OCR on the image（只有一张图，进程内跑，不开进程池）
+with OCREngine(workers=0, config='') as engine:
+    text = engine.ocr(image)
 
-print(text)
\ No newline at end of file
+print(text)
@@ -10,8 +10,11 @@ import pytesseract
 import trafilatura
 from io import BytesIO
 
-# 设置 tesseract 路径（Windows 下）
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+from ocr_engine import get_engine
+
+# 设置 tesseract 路径（Windows 下，只在没装 tesserocr、退回 pytesseract 时用到）
+TESSERACT_CMD = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
 
 
 
@@ -58,10 +61,12 @@ def clean_abs_page(url):
 
 
 def ocr_image(image):
-    text = pytesseract.image_to_string(image)
+    # 进程池里的 worker 常驻一个 Tesseract API，不再每张图起一个 tesseract 进程
+    text = get_engine(config='', tesseract_cmd=TESSERACT_CMD).ocr(image)
     return text.strip()
 
-def main():
+def main_selenium():
+    # 旧流程：每篇论文 requests 一次 + Selenium 再加载一次，串行，sleep 1.2s
     links = fetch_paper_links()
     print(f"Total papers: {len(links)}")
     driver = get_driver()
@@ -87,5 +92,15 @@ def main():
         json.dump(records, f, ensure_ascii=False, indent=2)
     driver.quit()
 
+def main():
+    # 新流程见 scraper.py：httpx 异步并发 + 令牌桶限速，每页只请求、解析一次；截图用复用的浏览器 context 池
+    import asyncio
+    from scraper import scrape
+    records, failed = asyncio.run(scrape(limit=10, screenshots=2, ocr=True))
+    for url, e in failed:
+        print(f"failed: {url}: {e!r}")
+    with open("arxiv_clean.json", "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+
 if __name__ == "__main__":
     main()
@@ -1,8 +1,12 @@
-import requests, os
+import requests, os, argparse
 from bs4 import BeautifulSoup
 from pdf2image import convert_from_path
-import pytesseract
-from PIL import Image
+from ocr_engine import get_engine
+from page_cache import CACHE_FILE, PageCache, file_sha256, ocr_key, resolve
+
+# Windows 下 poppler 不在 PATH 里；其他系统用 PATH 里的 pdftoppm
+POPPLER_PATH = os.environ.get(
+    'POPPLER_PATH', r"C:\Program Files\poppler-24.08.0\Library\bin" if os.name == 'nt' else None)
 
 def get_latest_arxiv_ids(category='cs.CL', max_results=10):
     url = f"https://arxiv.org/list/{category}/new"
@@ -13,8 +17,8 @@ def get_latest_arxiv_ids(category='cs.CL', max_results=10):
     return arxiv_ids
 
 
-def download_pdf(arxiv_id, out_dir='pdfs'):
-    url = f'https://arxiv.org/pdf/{arxiv_id}.pdf'
+def download_pdf(arxiv_id, out_dir='pdfs', base_url='https://arxiv.org/pdf'):
+    url = f'{base_url}/{arxiv_id}.pdf'
     os.makedirs(out_dir, exist_ok=True)
     pdf_path = os.path.join(out_dir, f'{arxiv_id}.pdf')
     if not os.path.exists(pdf_path):
@@ -23,42 +27,110 @@ def download_pdf(arxiv_id, out_dir='pdfs'):
             f.write(r.content)
     return pdf_path
 
+def pdf_page_count(pdf_path):
+    from pdf2image import pdfinfo_from_path
+    return pdfinfo_from_path(pdf_path, poppler_path=POPPLER_PATH)['Pages']
+
+def iter_pdf_pages(pdf_path, dpi=300, window=1, pages=None, grayscale=False):
+    """逐页渲染：每次只让 pdftoppm 渲染 window 页，yield (页码, PIL image)。
+
+    convert_from_path 一次渲染整本 PDF，内存随页数增长；这里峰值内存只取决于 window。
+    pages 可以只渲染指定页码（从 1 开始）。
+    """
+    if pages is None:
+        pages = range(1, pdf_page_count(pdf_path) + 1)
+    pages = sorted(pages)
+    i = 0
+    while i < len(pages):
+        # 连续页码合并成一次调用，最多 window 页
+        first = last = pages[i]
+        i += 1
+        while i < len(pages) and pages[i] == last + 1 and last - first + 1 < window:
+            last = pages[i]
+            i += 1
+        images = convert_from_path(pdf_path, dpi=dpi, first_page=first, last_page=last,
+                                   grayscale=grayscale, poppler_path=POPPLER_PATH)
+        for offset, img in enumerate(images):
+            yield first + offset, img
+        del images
+
+def save_pages(pages, out_dir, stem):
+    """把 (页码, image) 存成 PNG，同时原样传下去（OCR 直接用内存里的图，不再读回）。"""
+    os.makedirs(out_dir, exist_ok=True)
+    for page, img in pages:
+        img.save(os.path.join(out_dir, f"{stem}_page{page}.png"), 'PNG')
+        yield page, img
+
 def pdf_to_images(pdf_path, out_dir='images'):
-    import os
-    from pdf2image import convert_from_path
+    stem = os.path.basename(pdf_path).replace('.pdf', '')
+    pages = save_pages(iter_pdf_pages(pdf_path, dpi=300), out_dir, stem)
+    return [os.path.join(out_dir, f"{stem}_page{page}.png") for page, _ in pages]
 
-    os.makedirs(out_dir, exist_ok=True) 
-    poppler_path = r"C:\Program Files\poppler-24.08.0\Library\bin"
-    images = convert_from_path(pdf_path, dpi=300, poppler_path=poppler_path)
-    image_paths = []
-    for idx, img in enumerate(images):
-        image_path = os.path.join(out_dir, f"{os.path.basename(pdf_path).replace('.pdf','')}_page{idx+1}.png")
-        img.save(image_path, 'PNG')
-        image_paths.append(image_path)
-    return image_paths
+custom_oem_psm_config = r'--oem 3 --psm 1'
 
-def ocr_image(image_path):
-    custom_oem_psm_config = r'--oem 3 --psm 1'
-    text = pytesseract.image_to_string(Image.open(image_path), config=custom_oem_psm_config)
-    return text
+def ocr_image(image):
+    # image 可以是图片路径、PIL image 或 numpy 数组
+    return get_engine(config=custom_oem_psm_config).ocr(image)
 
-def images_to_txt(image_paths, out_txt):
+def images_to_txt(images, out_txt):
+    # images: 路径列表，或 iter_pdf_pages 之类的生成器（逐页 OCR，不落盘）
+    # imap 边渲染边把页面分给 OCR 进程池，按页序写出，最多只有几页在内存里
+    engine = get_engine(config=custom_oem_psm_config)
     with open(out_txt, 'w', encoding='utf-8') as f:
-        for i, img in enumerate(image_paths):
+        for i, text in enumerate(engine.imap(images)):
             f.write(f"\n\n---- Page {i+1} ----\n")
-            text = ocr_image(img)
             f.write(text)
 
-def batch_pdf_to_txt(arxiv_ids, pdf_dir='pdfs', txt_dir='pdf_ocr'):
+def ocr_pages(pages):
+    # pages: (页码, image) 生成器 -> 逐个 yield (页码, 文本)；imap 按顺序返回，第 i 个结果就是第 i 个送进去的页
+    order = []
+    def images():
+        for page, img in pages:
+            order.append(page)
+            yield img
+    for i, text in enumerate(get_engine(config=custom_oem_psm_config).imap(images())):
+        yield order[i], text
+
+def batch_pdf_to_txt(arxiv_ids, pdf_dir='pdfs', txt_dir='pdf_ocr', save_png=False, dpi=300, use_text_layer=True):
     os.makedirs(txt_dir, exist_ok=True)
+    # 按 (PDF 内容哈希, 页码, dpi, OCR 配置 + 渲染模式) 缓存每页文本；重跑只算缓存里没有的页
+    cache = PageCache(os.path.join(txt_dir, CACHE_FILE))
+    key = ocr_key(custom_oem_psm_config, grayscale=False)  # 这里渲染的是彩色页，和 pipeline 的灰度页分开存
     for arxiv_id in arxiv_ids:
         pdf_path = os.path.join(pdf_dir, f"{arxiv_id}.pdf")
-        images = pdf_to_images(pdf_path, out_dir=f'images/{arxiv_id}')
+        sha, n_pages = file_sha256(pdf_path), pdf_page_count(pdf_path)
+        # 先查缓存，再用 PDF 自带的文字层；只有扫描页、图多字少的页才渲染 + OCR（save_png 也只存这些页）
+        texts, todo, cached = resolve(cache, pdf_path, sha, n_pages, dpi, key,
+                                      use_text_layer, POPPLER_PATH)
+        n_text = len(texts) - cached
+        if todo:
+            pages = iter_pdf_pages(pdf_path, dpi=dpi, pages=todo)
+            if save_png:
+                pages = save_pages(pages, f'images/{arxiv_id}', arxiv_id)
+            for page, text in ocr_pages(pages):
+                cache.put(sha, page, dpi, key, text)  # 每页算完就存，中断了下次接着跑
+                texts[page] = text
         out_txt = os.path.join(txt_dir, f"{arxiv_id}.txt")
-        images_to_txt(images, out_txt)
-        print(f"OCR done: {out_txt}")
+        # 全部来自缓存且 txt 已经在了，就不重写
+        if cached < n_pages or not os.path.exists(out_txt):
+            with open(out_txt, 'w', encoding='utf-8') as f:
+                for page in sorted(texts):
+                    f.write(f"\n\n---- Page {page} ----\n")
+                    f.write(texts[page])
+        cache.paper_done(arxiv_id, sha, n_pages)
+        print(f"OCR done: {out_txt} (cache {cached} pages, text layer {n_text} pages, OCR {len(todo)} pages)")
+    cache.close()
 
 # 主流程
-arxiv_ids = get_latest_arxiv_ids('cs.CL', 5)
-[download_pdf(i) for i in arxiv_ids]
-batch_pdf_to_txt(arxiv_ids)
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--since', nargs='?', const='', default=None, metavar='ID',
+                    help='只处理比 ID 新的论文；不带 ID 时只处理之前没跑完的')
+    args = ap.parse_args()
+    arxiv_ids = get_latest_arxiv_ids('cs.CL', 5)
+    if args.since is not None:
+        cache = PageCache(os.path.join('pdf_ocr', CACHE_FILE))
+        arxiv_ids = cache.new_ids(arxiv_ids, args.since)
+        cache.close()
+    [download_pdf(i) for i in arxiv_ids]
+    batch_pdf_to_txt(arxiv_ids)
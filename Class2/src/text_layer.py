@@ -0,0 +1,68 @@
+"""Embedded text layer of born-digital PDFs, so only pages without one need OCR.
+
+``pdftotext`` (poppler, already required by pdf2image) dumps the whole document in one
+call, with pages separated by form feeds. Each page is then checked: it must have at
+least TEXT_LAYER_MIN_CHARS non-space characters, and at most TEXT_LAYER_MAX_GARBAGE of
+them may be garbage (U+FFFD, control and private-use characters, the usual result of
+fonts without a Unicode map). Scanned pages and pages that are mostly figures fail the
+check and go to the raster + OCR path instead.
+
+Usage:
+    texts, need_ocr = split_pages('pdfs/2507.19511.pdf')
+    # texts: {page: text} for good pages; need_ocr: pages to OCR (None = all of them)
+
+Env:
+  TEXT_LAYER_MIN_CHARS   : min non-space characters on a page (default: 200)
+  TEXT_LAYER_MAX_GARBAGE : max garbage ratio (default: 0.05)
+"""
+import os
+import subprocess
+import unicodedata
+
+MIN_CHARS = int(os.environ.get('TEXT_LAYER_MIN_CHARS', 200))
+MAX_GARBAGE = float(os.environ.get('TEXT_LAYER_MAX_GARBAGE', 0.05))
+
+_GARBAGE_CATEGORIES = {'Cc', 'Co', 'Cn', 'Cs'}  # control, private use, unassigned, surrogate
+
+
+def extract_pages(pdf_path, poppler_path=None):
+    """Text of every page (index 0 = page 1), via one pdftotext call."""
+    exe = os.path.join(poppler_path, 'pdftotext') if poppler_path else 'pdftotext'
+    out = subprocess.run([exe, '-enc', 'UTF-8', pdf_path, '-'],
+                         capture_output=True, check=True).stdout.decode('utf-8', errors='replace')
+    pages = out.split('\f')
+    if pages and pages[-1] == '':
+        pages.pop()  # pdftotext ends every page, including the last, with \f
+    return pages
+
+
+def page_quality(text):
+    """(non-space characters, garbage ratio) of one page."""
+    chars = [c for c in text if not c.isspace()]
+    if not chars:
+        return 0, 0.0
+    garbage = sum(1 for c in chars if c == '\ufffd' or unicodedata.category(c) in _GARBAGE_CATEGORIES)
+    return len(chars), garbage / len(chars)
+
+
+def is_good(text, min_chars=MIN_CHARS, max_garbage=MAX_GARBAGE):
+    n_chars, garbage = page_quality(text)
+    return n_chars >= min_chars and garbage <= max_garbage
+
+
+def split_pages(pdf_path, poppler_path=None, min_chars=MIN_CHARS, max_garbage=MAX_GARBAGE):
+    """({page: text} for pages whose text layer is good, [pages that need OCR]).
+
+    If pdftotext is missing or fails on the file, returns ({}, None): OCR everything.
+    """
+    try:
+        pages = extract_pages(pdf_path, poppler_path)
+    except (OSError, subprocess.CalledProcessError):
+        return {}, None
+    texts, need_ocr = {}, []
+    for page, text in enumerate(pages, start=1):
+        if is_good(text, min_chars, max_garbage):
+            texts[page] = text
+        else:
+            need_ocr.append(page)
+    return texts, need_ocr
@@ -1,40 +1,281 @@
-"""ASR using OpenAI Whisper (PyTorch), decoding audio fully in-memory to avoid Windows temp-file locks.
+"""ASR using OpenAI Whisper, decoding audio fully in-memory to avoid Windows temp-file locks.
+
+Two interchangeable backends, selected with ASR_BACKEND:
+  - whisper      : openai-whisper (PyTorch), the original path
+  - ctranslate2  : faster-whisper (CTranslate2), int8-quantized by default; much faster on CPU
 
 Requirements:
-  - pip install openai-whisper pydub numpy
-  - ffmpeg installed and on PATH (pydub uses it under the hood)
+  - pip install openai-whisper pydub numpy   (or: pip install faster-whisper for ctranslate2)
+  - ffmpeg installed and on PATH (pydub uses it for compressed uploads; WAV is decoded in-process)
   - torch installed per your platform: https://pytorch.org/get-started/locally/
 
 Env:
+  ASR_BACKEND : whisper|ctranslate2 (default: whisper)
   ASR_MODEL   : tiny|base|small|medium|large-v3 (default: small)
+  ASR_COMPUTE_TYPE : ctranslate2 compute type, e.g. int8|int8_float16|float32 (default: int8)
   ASR_DEVICE  : cpu|cuda (default: cpu)
   ASR_LANG    : force language code like 'en'|'zh' (default: auto-detect)
+  ASR_BATCH   : 1 to micro-batch concurrent clips (<= 30 s) through one encoder/decoder pass;
+                whisper backend only (default: 0)
+  ASR_BATCH_MAX     : max clips per batch (default: 8)
+  ASR_BATCH_WAIT_MS : how long to wait for more clips before running a batch (default: 10)
+  ASR_VAD     : 1 to trim silence with an energy VAD and skip ASR when there is no speech (default: 1)
+  ASR_VAD_MARGIN_DB : frame energy above the noise floor that counts as speech (default: 12)
+  ASR_VAD_MIN_DB    : absolute floor in dBFS; quieter frames are never speech (default: -50)
+  ASR_VAD_PAD_MS    : padding kept around each speech region (default: 200)
+  ASR_VAD_MIN_SILENCE_MS : shorter pauses do not split a segment (default: 300)
+  ASR_SEGMENT_WORKERS    : parallel transcriptions for recordings split into > 30 s chunks (default: 2)
 """
 from __future__ import annotations
 
 import os
 import io
-from typing import Optional
+import math
+import queue
+import struct
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
-from pydub import AudioSegment
-import whisper
 
-_MODEL = None
+from metrics import span
+
 _DEVICE = os.getenv("ASR_DEVICE", "cpu").lower()
+_N_SAMPLES = 30 * 16000  # one Whisper window
+
+class WhisperBackend:
+    """openai-whisper (PyTorch, fp32 on CPU)."""
+    name = "whisper"
+
+    def __init__(self, model_name: str):
+        import whisper
+        self.model = whisper.load_model(model_name, device=_DEVICE)
+
+    def transcribe(self, audio: np.ndarray, language: Optional[str]) -> str:
+        # CPU 下禁用 FP16；用贪心解码更稳
+        result = self.model.transcribe(
+            audio=audio,
+            language=language,
+            fp16=False if _DEVICE == "cpu" else True,
+            temperature=0.0,
+            no_speech_threshold=0.6,
+            logprob_threshold=-1.0,
+            compression_ratio_threshold=2.4,
+            # 如需 beam search，再加上：
+            # beam_size=5, patience=0.2,
+        )
+        return (result.get("text") or "").strip()
+
+class CTranslate2Backend:
+    """faster-whisper (CTranslate2), int8 weights by default."""
+    name = "ctranslate2"
+
+    def __init__(self, model_name: str):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(
+            model_name,
+            device=_DEVICE,
+            compute_type=os.getenv("ASR_COMPUTE_TYPE", "int8"),
+        )
+
+    def transcribe(self, audio: np.ndarray, language: Optional[str]) -> str:
+        segments, _info = self.model.transcribe(
+            audio,
+            language=language,
+            beam_size=1,
+            temperature=0.0,
+            no_speech_threshold=0.6,
+            log_prob_threshold=-1.0,
+            compression_ratio_threshold=2.4,
+        )
+        return "".join(seg.text for seg in segments).strip()
+
+_BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    CTranslate2Backend.name: CTranslate2Backend,
+}
+
+_BACKEND = None
+_BACKEND_LOCK = threading.Lock()
+
+def _get_backend():
+    global _BACKEND
+    if _BACKEND is None:
+        with _BACKEND_LOCK:
+            if _BACKEND is None:
+                name = os.getenv("ASR_BACKEND", "whisper").lower()
+                if name not in _BACKENDS:
+                    raise ValueError(f"ASR_BACKEND must be one of {sorted(_BACKENDS)}, got {name!r}")
+                _BACKEND = _BACKENDS[name](os.getenv("ASR_MODEL", "small"))
+    return _BACKEND
 
 def _get_model():
-    global _MODEL
-    if _MODEL is None:
-        model_name = os.getenv("ASR_MODEL", "small")
-        _MODEL = whisper.load_model(model_name, device=_DEVICE)
-    return _MODEL
+    """The underlying openai-whisper model (whisper backend only)."""
+    backend = _get_backend()
+    if not isinstance(backend, WhisperBackend):
+        raise RuntimeError("batched decoding requires ASR_BACKEND=whisper")
+    return backend.model
 
-def _bytes_to_mono16k_float32(audio_bytes: bytes) -> np.ndarray:
+_TARGET_SR = 16000
+
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_IEEE_FLOAT = 0x0003
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+def _parse_wav(audio_bytes: bytes) -> Optional[Tuple[np.ndarray, int]]:
+    """Parse a RIFF/WAVE header and view the samples in place (no copy).
+
+    Returns ((frames, channels) array, sample_rate), or None for anything that is not
+    plain PCM / IEEE-float WAV so the caller can fall back to ffmpeg.
+    """
+    if len(audio_bytes) < 12 or audio_bytes[:4] != b"RIFF" or audio_bytes[8:12] != b"WAVE":
+        return None
+    fmt = None
+    pos = 12
+    while pos + 8 <= len(audio_bytes):
+        chunk_id = audio_bytes[pos:pos + 4]
+        (size,) = struct.unpack_from("<I", audio_bytes, pos + 4)
+        body = pos + 8
+        if chunk_id == b"fmt " and size >= 16:
+            if body + 16 > len(audio_bytes):  # header claims more fmt than was uploaded
+                return None
+            tag, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", audio_bytes, body)
+            if tag == _WAVE_FORMAT_EXTENSIBLE and size >= 40 and body + 26 <= len(audio_bytes):
+                (tag,) = struct.unpack_from("<H", audio_bytes, body + 24)
+            fmt = (tag, channels, rate, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            tag, channels, rate, bits = fmt
+            if tag == _WAVE_FORMAT_PCM and bits in (8, 16, 24, 32):
+                dtype = {8: "u1", 16: "<i2", 24: "u1", 32: "<i4"}[bits]
+            elif tag == _WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+                dtype = {32: "<f4", 64: "<f8"}[bits]
+            else:
+                return None
+            # Streaming writers may leave the size as 0 or 0xFFFFFFFF; take what is there.
+            end = len(audio_bytes) if size in (0, 0xFFFFFFFF) else min(body + size, len(audio_bytes))
+            frame_bytes = channels * bits // 8
+            if frame_bytes == 0 or rate == 0:  # malformed header; let ffmpeg have a go
+                return None
+            end -= (end - body) % frame_bytes
+            samples = np.frombuffer(audio_bytes, dtype=dtype, count=(end - body) // np.dtype(dtype).itemsize, offset=body)
+            if bits == 24:
+                return samples.reshape(-1, channels, 3), rate
+            return samples.reshape(-1, channels), rate
+        pos = body + size + (size & 1)
+    return None
+
+def _to_mono_float32(samples: np.ndarray) -> np.ndarray:
+    """(frames, channels) integer/float samples -> mono float32 in [-1, 1]."""
+    if samples.ndim == 3:  # 24-bit packed: assemble little-endian triplets into int32
+        b = samples.astype(np.int32)
+        samples = ((b[..., 0] | (b[..., 1] << 8) | (b[..., 2] << 16)) << 8) >> 8
+        scale = 1.0 / 8388608.0
+        offset = 0.0
+    elif samples.dtype == np.uint8:
+        scale, offset = 1.0 / 128.0, -1.0
+    elif samples.dtype.kind == "i":
+        scale, offset = 1.0 / float(2 ** (8 * samples.dtype.itemsize - 1)), 0.0
+    else:
+        scale, offset = 1.0, 0.0
+    if samples.shape[1] == 1:
+        mono = samples[:, 0].astype(np.float32)
+    else:
+        mono = samples.mean(axis=1, dtype=np.float32)
+    mono *= scale
+    if offset:
+        mono += offset
+    return mono
+
+def _polyphase_filter(up: int, down: int) -> Tuple[np.ndarray, int]:
+    """Kaiser-windowed sinc low-pass (same design as scipy.signal.resample_poly) split into phases."""
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    n = np.arange(-half_len, half_len + 1, dtype=np.float64)
+    cutoff = 1.0 / max_rate
+    h = cutoff * np.sinc(cutoff * n) * np.kaiser(len(n), 5.0)
+    h *= up / h.sum()
+    taps = -(-len(h) // up)
+    h = np.concatenate([h, np.zeros(taps * up - len(h))])
+    # bank[p, k] = h[p + k*up]
+    return h.reshape(taps, up).T.astype(np.float32), half_len
+
+_POLY_CACHE: Dict[Tuple[int, int], Tuple[np.ndarray, int]] = {}
+
+def _resample(audio: np.ndarray, sr_in: int, sr_out: int = _TARGET_SR, block: int = 16384) -> np.ndarray:
+    """Vectorized polyphase resampling, fully in-process."""
+    if sr_in == sr_out:
+        return audio
+    g = math.gcd(sr_in, sr_out)
+    up, down = sr_out // g, sr_in // g
+    try:
+        from scipy.signal import resample_poly
+        return resample_poly(audio, up, down).astype(np.float32, copy=False)
+    except ImportError:
+        pass
+    if (up, down) not in _POLY_CACHE:
+        _POLY_CACHE[(up, down)] = _polyphase_filter(up, down)
+    bank, half_len = _POLY_CACHE[(up, down)]
+    taps = bank.shape[1]
+    n_out = -(-len(audio) * up // down)
+    # Zero-pad so every tap index is in range: x index = t//up - k, with t = m*down + half_len
+    pad = taps
+    padded = np.concatenate([np.zeros(pad, np.float32), audio, np.zeros(pad + half_len // up + 1, np.float32)])
+    k = np.arange(taps)
+    out = np.empty(n_out, dtype=np.float32)
+    for start in range(0, n_out, block):
+        m = np.arange(start, min(start + block, n_out))
+        t = m * down + half_len
+        idx = (t // up)[:, None] - k[None, :] + pad
+        out[start:start + len(m)] = np.einsum("ij,ij->i", padded[idx], bank[t % up])
+    return out
+
+class StreamResampler:
+    """Chunk-by-chunk version of _resample for live audio (same filter, same alignment).
+
+    Resampling each chunk on its own zero-pads every chunk boundary and rounds every
+    chunk's output length. Here the filter history and the input position carry over, so
+    the output equals resampling the concatenated stream, lagging by half a filter.
+    """
+
+    def __init__(self, sr_in: int, sr_out: int = _TARGET_SR):
+        g = math.gcd(sr_in, sr_out)
+        self.up, self.down = sr_out // g, sr_in // g
+        if (self.up, self.down) not in _POLY_CACHE:
+            _POLY_CACHE[(self.up, self.down)] = _polyphase_filter(self.up, self.down)
+        self.bank, self.half_len = _POLY_CACHE[(self.up, self.down)]
+        taps = self.bank.shape[1]
+        self.k = np.arange(taps)
+        self.buf = np.zeros(taps, np.float32)  # input samples from index buf_start on
+        self.buf_start = -taps                 # (negative indices: the stream starts on silence)
+        self.n_in = 0
+        self.m = 0                             # next output sample
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        self.buf = np.concatenate([self.buf, chunk.astype(np.float32, copy=False)])
+        self.n_in += len(chunk)
+        # Output m needs input up to index (m*down + half_len) // up.
+        m_end = max(self.m, (self.n_in * self.up - 1 - self.half_len) // self.down + 1)
+        m = np.arange(self.m, m_end)
+        t = m * self.down + self.half_len
+        idx = (t // self.up)[:, None] - self.k[None, :] - self.buf_start
+        out = np.einsum("ij,ij->i", self.buf[idx], self.bank[t % self.up]).astype(np.float32, copy=False)
+        self.m = m_end
+        keep = (self.m * self.down + self.half_len) // self.up - len(self.k) + 1
+        if keep > self.buf_start:
+            self.buf = self.buf[keep - self.buf_start:]
+            self.buf_start = keep
+        return out
+
+def _decode_with_ffmpeg(audio_bytes: bytes) -> np.ndarray:
     """Decode bytes with pydub+ffmpeg entirely in memory, resample to 16k mono float32 in [-1, 1]."""
+    from pydub import AudioSegment  # only needed for compressed formats
     seg = AudioSegment.from_file(io.BytesIO(audio_bytes))     # ffmpeg reads from memory, not from a path
-    if seg.frame_rate != 16000:
-        seg = seg.set_frame_rate(16000)
+    if seg.frame_rate != _TARGET_SR:
+        seg = seg.set_frame_rate(_TARGET_SR)
     if seg.channels != 1:
         seg = seg.set_channels(1)
     # pydub gives 16-bit PCM samples; convert to float32 [-1,1]
@@ -42,29 +283,196 @@ def _bytes_to_mono16k_float32(audio_bytes: bytes) -> np.ndarray:
     audio = samples.astype(np.float32) / 32768.0
     return audio
 
-def transcribe_audio(audio_bytes: bytes, language: Optional[str] = None) -> str:
-    if not audio_bytes:
-        return ""
+def _bytes_to_mono16k_float32(audio_bytes: bytes) -> np.ndarray:
+    """Decode to 16k mono float32 in [-1, 1]: in-process for WAV, ffmpeg for everything else."""
+    parsed = _parse_wav(audio_bytes)
+    if parsed is None:
+        return _decode_with_ffmpeg(audio_bytes)
+    samples, rate = parsed
+    return _resample(_to_mono_float32(samples), rate)
+
+def _decode_batch(model, audios: List[np.ndarray], language: Optional[str]) -> List[str]:
+    """Pad clips to 30 s mel windows and run one batched greedy decode over all of them."""
+    import torch
+    import whisper
+
+    mels = torch.stack([
+        whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(a)), n_mels=model.dims.n_mels)
+        for a in audios
+    ]).to(model.device)
+    options = whisper.DecodingOptions(
+        language=language,
+        fp16=False if _DEVICE == "cpu" else True,
+        temperature=0.0,
+        without_timestamps=True,
+    )
+    texts = []
+    for r in whisper.decode(model, mels, options):
+        # Same silence rule model.transcribe applies with no_speech_threshold/logprob_threshold
+        if r.no_speech_prob > 0.6 and r.avg_logprob < -1.0:
+            texts.append("")
+        else:
+            texts.append(r.text.strip())
+    return texts
+
+class _BatchScheduler(threading.Thread):
+    """Collects clips for up to ASR_BATCH_WAIT_MS and decodes them together."""
+
+    def __init__(self, max_batch: int, max_wait_s: float):
+        super().__init__(name="asr-batcher", daemon=True)
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_s
+        self.jobs: "queue.Queue[tuple[np.ndarray, Optional[str], Future]]" = queue.Queue()
+
+    def submit(self, audio: np.ndarray, language: Optional[str]) -> Future:
+        fut: Future = Future()
+        self.jobs.put((audio, language, fut))
+        return fut
+
+    def _collect(self):
+        batch = [self.jobs.get()]
+        deadline = time.monotonic() + self.max_wait_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.jobs.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return [job for job in batch if job[2].set_running_or_notify_cancel()]
+
+    def run(self):
+        while True:
+            batch = self._collect()
+            # DecodingOptions takes one language per batch; auto-detect (None) is per clip.
+            groups = {}
+            for job in batch:
+                groups.setdefault(job[1], []).append(job)
+            for language, jobs in groups.items():
+                try:
+                    texts = _decode_batch(_get_model(), [a for a, _, _ in jobs], language)
+                except BaseException as e:
+                    for _, _, fut in jobs:
+                        fut.set_exception(e)
+                    continue
+                for (_, _, fut), text in zip(jobs, texts):
+                    fut.set_result(text)
+
+_SCHEDULER: Optional[_BatchScheduler] = None
+_SCHEDULER_LOCK = threading.Lock()
+
+def _get_scheduler() -> Optional[_BatchScheduler]:
+    global _SCHEDULER
+    if os.getenv("ASR_BATCH", "0") != "1" or os.getenv("ASR_BACKEND", "whisper").lower() != "whisper":
+        return None
+    if _SCHEDULER is None:
+        with _SCHEDULER_LOCK:
+            if _SCHEDULER is None:
+                scheduler = _BatchScheduler(
+                    max_batch=int(os.getenv("ASR_BATCH_MAX", "8")),
+                    max_wait_s=float(os.getenv("ASR_BATCH_WAIT_MS", "10")) / 1000.0,
+                )
+                scheduler.start()
+                _SCHEDULER = scheduler
+    return _SCHEDULER
+
+_VAD_FRAME = 480  # 30 ms at 16 kHz
+
+def _speech_segments(audio: np.ndarray) -> List[Tuple[int, int]]:
+    """Energy VAD: (start, end) sample ranges that contain speech, padded and merged."""
+    n = len(audio) // _VAD_FRAME
+    if n == 0:
+        return []
+    frames = audio[:n * _VAD_FRAME].reshape(n, _VAD_FRAME)
+    energy_db = 10.0 * np.log10(np.einsum("ij,ij->i", frames, frames) / _VAD_FRAME + 1e-10)
+    noise_db = np.percentile(energy_db, 10)
+    peak_db = energy_db.max()
+    # Relative to the noise floor, but never above peak-20 dB (all-speech clips have no floor)
+    threshold = max(float(os.getenv("ASR_VAD_MIN_DB", "-50")),
+                    min(noise_db + float(os.getenv("ASR_VAD_MARGIN_DB", "12")), peak_db - 20.0))
+    speech = energy_db > threshold
+    if not speech.any():
+        return []
+
+    frame_ms = _VAD_FRAME * 1000 // _TARGET_SR
+    pad = int(os.getenv("ASR_VAD_PAD_MS", "200")) // frame_ms
+    if pad:
+        speech = np.convolve(speech, np.ones(2 * pad + 1), mode="same") > 0
+    edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    min_gap = int(os.getenv("ASR_VAD_MIN_SILENCE_MS", "300")) // frame_ms
+    keep = (starts[1:] - ends[:-1]) >= min_gap
+    starts = starts[np.concatenate(([True], keep))]
+    ends = ends[np.concatenate((keep, [True]))]
+    return [(int(s) * _VAD_FRAME, min(int(e) * _VAD_FRAME, len(audio))) for s, e in zip(starts, ends)]
+
+def _pack_segments(segments: List[Tuple[int, int]], max_len: int = _N_SAMPLES) -> List[Tuple[int, int]]:
+    """Group consecutive speech segments into chunks of at most one Whisper window."""
+    chunks: List[Tuple[int, int]] = []
+    for start, end in segments:
+        if chunks and end - chunks[-1][0] <= max_len:
+            chunks[-1] = (chunks[-1][0], end)
+        else:
+            chunks.append((start, end))
+    return chunks
 
+_SEGMENT_POOL: Optional[ThreadPoolExecutor] = None
+_SEGMENT_POOL_LOCK = threading.Lock()
+
+def _get_segment_pool() -> ThreadPoolExecutor:
+    global _SEGMENT_POOL
+    if _SEGMENT_POOL is None:
+        with _SEGMENT_POOL_LOCK:
+            if _SEGMENT_POOL is None:
+                _SEGMENT_POOL = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("ASR_SEGMENT_WORKERS", "2")), thread_name_prefix="asr-segment")
+    return _SEGMENT_POOL
+
+def _transcribe_one(audio: np.ndarray, language: Optional[str]) -> str:
+    scheduler = _get_scheduler()
+    if scheduler is not None and len(audio) <= _N_SAMPLES:
+        return scheduler.submit(audio, language).result()
+
+    return _get_backend().transcribe(audio, language)
+
+def transcribe_array(audio: np.ndarray, language: Optional[str] = None) -> str:
+    """Transcribe 16 kHz mono float32 samples."""
     forced_lang = os.getenv("ASR_LANG")
     if forced_lang:
         language = forced_lang
 
-    model = _get_model()
+    if os.getenv("ASR_VAD", "1") != "1":
+        with span("asr"):
+            return _transcribe_one(audio, language)
+
+    # Trim silence first; no speech at all means no model call.
+    with span("vad"):
+        chunks = _pack_segments(_speech_segments(audio))
+    if not chunks:
+        return ""
+    with span("asr"):
+        if len(chunks) == 1:
+            start, end = chunks[0]
+            return _transcribe_one(audio[start:end], language)
+
+        texts = _get_segment_pool().map(lambda c: _transcribe_one(audio[c[0]:c[1]], language), chunks)
+        return " ".join(t for t in texts if t)
+
+def transcribe_audio(audio_bytes: bytes, language: Optional[str] = None) -> str:
+    if not audio_bytes:
+        return ""
 
     # Decode fully in memory -> numpy float32 16k mono
-    audio = _bytes_to_mono16k_float32(audio_bytes)
+    with span("decode"):
+        audio = _bytes_to_mono16k_float32(audio_bytes)
+    return transcribe_array(audio, language)
 
-    # CPU 下禁用 FP16；用贪心解码更稳
-    result = model.transcribe(
-        audio=audio,
-        language=language,
-        fp16=False if _DEVICE == "cpu" else True,
-        temperature=0.0,
-        no_speech_threshold=0.6,
-        logprob_threshold=-1.0,
-        compression_ratio_threshold=2.4,
-        # 如需 beam search，再加上：
-        # beam_size=5, patience=0.2,
-    )
-    return (result.get("text") or "").strip()
+def warmup() -> Dict[str, float]:
+    """Load the backend and run one silent window through it (bypassing VAD, which would skip it)."""
+    t0 = time.perf_counter()
+    backend = _get_backend()
+    _get_scheduler()
+    t1 = time.perf_counter()
+    backend.transcribe(np.zeros(_TARGET_SR, dtype=np.float32), "en")
+    return {"load": t1 - t0, "warm": time.perf_counter() - t1}
@@ -0,0 +1,156 @@
+"""Sampled, asynchronous capture of request/response audio for debugging.
+
+``capture()`` never touches the disk: it enqueues the bytes for a background writer
+thread and returns. The queue is bounded; when the writer falls behind, new captures are
+dropped (and counted) instead of slowing requests down. Sampling is decided per request
+id, so a request's upload and response are either both kept or both skipped.
+
+The writer enforces retention after each file: captures older than AUDIO_CAPTURE_MAX_AGE_H
+are deleted, then the oldest ones until the directory fits in AUDIO_CAPTURE_MAX_MB.
+
+Env:
+  AUDIO_CAPTURE_RATE     : fraction of requests captured, 0 disables (default: 1.0)
+  AUDIO_CAPTURE_DIR      : output directory (default: tmp/ next to this file)
+  AUDIO_CAPTURE_QUEUE    : max pending captures before dropping (default: 64)
+  AUDIO_CAPTURE_MAX_MB   : directory size budget (default: 256)
+  AUDIO_CAPTURE_MAX_AGE_H: delete captures older than this many hours (default: 24)
+"""
+from __future__ import annotations
+
+import os
+import queue
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Optional, Tuple
+
+import metrics
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_-]+")
+
+
+def _sampled(request_id: str, rate: float) -> bool:
+    if rate >= 1.0:
+        return True
+    if rate <= 0.0:
+        return False
+    return zlib.crc32(request_id.encode("utf-8")) / 2 ** 32 < rate
+
+
+class AudioCaptureSink(threading.Thread):
+    def __init__(self, directory: str, max_queue: int, max_bytes: int, max_age_s: float):
+        super().__init__(name="audio-capture", daemon=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self._queue: "queue.Queue[Tuple[str, bytes]]" = queue.Queue(maxsize=max_queue)
+        self._files: Deque[Tuple[float, int, str]] = deque()  # (mtime, size, path), oldest first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"queued": 0, "dropped": 0, "written": 0, "write_errors": 0, "deleted": 0}
+
+    def submit(self, name: str, data: bytes) -> bool:
+        try:
+            self._queue.put_nowait((name, data))
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped"] += 1
+            return False
+        with self._lock:
+            self._stats["queued"] += 1
+        return True
+
+    def _scan(self) -> None:
+        # Pick up captures left by earlier runs so retention covers them too.
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file():
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        entries.sort()
+        self._files.extend(entries)
+        self._bytes = sum(size for _, size, _ in entries)
+
+    def _enforce_retention(self, now: float) -> None:
+        while self._files and (self._bytes > self.max_bytes or now - self._files[0][0] > self.max_age_s):
+            _, size, path = self._files.popleft()
+            self._bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            with self._lock:
+                self._stats["deleted"] += 1
+
+    def run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._scan()
+        self._enforce_retention(time.time())
+        while True:
+            name, data = self._queue.get()
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, "wb") as f:
+                    f.write(data)
+            except OSError:
+                with self._lock:
+                    self._stats["write_errors"] += 1
+                continue
+            now = time.time()
+            self._files.append((now, len(data), path))
+            self._bytes += len(data)
+            with self._lock:
+                self._stats["written"] += 1
+            self._enforce_retention(now)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, pending=self._queue.qsize(), bytes=self._bytes, files=len(self._files))
+
+
+_SINK: Optional[AudioCaptureSink] = None
+_SINK_LOCK = threading.Lock()
+
+
+def get_sink() -> Optional[AudioCaptureSink]:
+    """Process-wide sink configured from the environment, or None when capture is off."""
+    global _SINK
+    if float(os.getenv("AUDIO_CAPTURE_RATE", "1.0")) <= 0:
+        return None
+    if _SINK is None:
+        with _SINK_LOCK:
+            if _SINK is None:
+                sink = AudioCaptureSink(
+                    directory=os.getenv("AUDIO_CAPTURE_DIR") or os.path.join(os.path.dirname(__file__), "tmp"),
+                    max_queue=int(os.getenv("AUDIO_CAPTURE_QUEUE", "64")),
+                    max_bytes=int(float(os.getenv("AUDIO_CAPTURE_MAX_MB", "256")) * 1024 * 1024),
+                    max_age_s=float(os.getenv("AUDIO_CAPTURE_MAX_AGE_H", "24")) * 3600,
+                )
+                sink.start()
+                _SINK = sink
+    return _SINK
+
+
+def capture(kind: str, session_id: str, data: bytes, ext: str = ".wav") -> bool:
+    """Queue ``data`` as ``{kind}_{timestamp}_{session}_{request id}{ext}``; never blocks.
+
+    Returns True if the capture was queued, False if it was sampled out or dropped.
+    """
+    sink = get_sink()
+    if sink is None or not data:
+        return False
+    rid = metrics.request_id()
+    if not _sampled(rid, float(os.getenv("AUDIO_CAPTURE_RATE", "1.0"))):
+        return False
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    name = _UNSAFE.sub("_", f"{kind}_{timestamp}_{session_id}_{rid}") + "." + _UNSAFE.sub("", ext)
+    return sink.submit(name, data)
+
+
+def stats() -> Dict[str, int]:
+    # Don't start a writer just to report on it (only main_with_logging captures).
+    return _SINK.stats() if _SINK is not None else {}
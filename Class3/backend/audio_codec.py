@@ -0,0 +1,47 @@
+"""Re-encode reply WAVs as FLAC or Ogg/Opus for clients that ask for it.
+
+FLAC is lossless and roughly halves speech WAVs; Opus is lossy and an order of magnitude
+smaller. Both go through soundfile (libsndfile), which is only imported when a compressed
+codec is requested; without it the reply falls back to WAV and says so in its header.
+"""
+from __future__ import annotations
+
+import io
+import wave
+from typing import Dict, Tuple
+
+import numpy as np
+
+CODECS = ("wav", "flac", "opus")
+
+_OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+
+
+def _wav_info(wav: bytes) -> Dict[str, object]:
+    with wave.open(io.BytesIO(wav), "rb") as w:
+        return {"format": "wav", "sample_rate": w.getframerate(), "channels": w.getnchannels()}
+
+
+def encode(wav: bytes, codec: str) -> Tuple[bytes, Dict[str, object]]:
+    """Return ``(payload, info)``; info holds the actual format, sample_rate and channels."""
+    if codec not in CODECS or codec == "wav":
+        return wav, _wav_info(wav)
+    try:
+        import soundfile as sf
+    except ImportError:
+        return wav, _wav_info(wav)
+
+    if codec == "flac":
+        data, sr = sf.read(io.BytesIO(wav), dtype="int16")
+        buf = io.BytesIO()
+        sf.write(buf, data, sr, format="FLAC", subtype="PCM_16")
+    else:
+        data, sr = sf.read(io.BytesIO(wav), dtype="float32", always_2d=True)
+        if sr not in _OPUS_RATES:
+            from asr import _resample  # Opus only encodes at a few fixed rates
+            data = np.stack([_resample(np.ascontiguousarray(ch), sr, 48000) for ch in data.T], axis=1)
+            sr = 48000
+        buf = io.BytesIO()
+        sf.write(buf, data, sr, format="OGG", subtype="OPUS")
+    channels = 1 if data.ndim == 1 else data.shape[1]
+    return buf.getvalue(), {"format": codec, "sample_rate": sr, "channels": channels}
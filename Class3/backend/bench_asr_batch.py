@@ -0,0 +1,66 @@
+"""Benchmark: Whisper throughput vs batch size on CPU.
+
+Runs the batched encoder + greedy decoder (asr._decode_batch) over the same set of clips
+at several batch sizes and reports clips/sec. Clips come from a folder of WAVs, or are
+synthesized with the local TTS engine when no folder is given.
+
+Usage:
+  python bench_asr_batch.py --wav-dir ./samples --sizes 1,2,4,8,16
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import time
+
+import asr
+import tts
+
+PHRASES = [
+    "What is the weather like today?",
+    "Set a timer for ten minutes.",
+    "Who wrote the novel Pride and Prejudice?",
+    "Play some relaxing music please.",
+]
+
+
+def _load_clips(wav_dir, n: int):
+    if wav_dir:
+        paths = sorted(glob.glob(os.path.join(wav_dir, "*.wav")))
+        if not paths:
+            raise SystemExit(f"no .wav files in {wav_dir}")
+        datas = []
+        for p in paths:
+            with open(p, "rb") as f:
+                datas.append(f.read())
+    else:
+        datas = [tts.tts_to_wav_bytes(PHRASES[i % len(PHRASES)]) for i in range(min(n, len(PHRASES)))]
+    clips = [asr._bytes_to_mono16k_float32(d) for d in datas]
+    return [clips[i % len(clips)] for i in range(n)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--wav-dir", default=None)
+    ap.add_argument("--sizes", default="1,2,4,8,16")
+    ap.add_argument("--clips", type=int, default=32, help="clips decoded per batch size")
+    ap.add_argument("--language", default="en")
+    args = ap.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    clips = _load_clips(args.wav_dir, args.clips)
+    model = asr._get_model()
+    asr._decode_batch(model, clips[:1], args.language)  # warm-up
+
+    print(f"model={os.getenv('ASR_MODEL', 'small')} device={asr._DEVICE} clips={len(clips)}")
+    for size in sizes:
+        t0 = time.perf_counter()
+        for i in range(0, len(clips), size):
+            asr._decode_batch(model, clips[i:i + size], args.language)
+        dt = time.perf_counter() - t0
+        print(f"batch={size:<3} {len(clips) / dt:6.2f} clips/s  ({dt / len(clips) * 1000:7.1f} ms/clip)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark: upload decode time per second of audio, ffmpeg (pydub) vs in-process WAV path.
+
+Generates WAV files in the formats browsers/Gradio typically send and times
+asr._decode_with_ffmpeg (the previous path) against asr._bytes_to_mono16k_float32.
+
+Usage:
+  python bench_decode.py --seconds 10 --runs 5
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import time
+import wave
+
+import numpy as np
+
+import asr
+
+FORMATS = [(16000, 1), (44100, 1), (48000, 1), (48000, 2)]
+
+
+def _make_wav(seconds: float, rate: int, channels: int) -> bytes:
+    t = np.arange(int(seconds * rate)) / rate
+    x = (0.3 * np.sin(2 * np.pi * 220 * t) * 32767).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(np.repeat(x[:, None], channels, axis=1).tobytes())
+    return buf.getvalue()
+
+
+def _best_of(fn, data: bytes, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn(data)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--skip-ffmpeg", action="store_true")
+    args = ap.parse_args()
+
+    print(f"{'format':<14}{'ffmpeg ms/s':>14}{'in-proc ms/s':>14}")
+    for rate, channels in FORMATS:
+        data = _make_wav(args.seconds, rate, channels)
+        new = _best_of(asr._bytes_to_mono16k_float32, data, args.runs) / args.seconds * 1000
+        old = float("nan") if args.skip_ffmpeg else _best_of(asr._decode_with_ffmpeg, data, args.runs) / args.seconds * 1000
+        print(f"{rate // 1000}k x{channels:<9}{old:>14.3f}{new:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
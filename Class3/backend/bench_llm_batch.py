@@ -0,0 +1,67 @@
+"""Multi-client benchmark for the LLM stage: serialized vs continuous batching.
+
+Each of ``--clients`` threads sends ``--requests`` prompts through llm.generate_response.
+The baseline runs them through a single worker (what LLM_WORKERS=1 does in the server);
+the batched run sets LLM_BATCHING=1 and lets every client submit concurrently.
+Reports generated tokens/sec and per-request latency.
+
+Usage:
+  python bench_llm_batch.py --clients 8 --requests 4
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import llm
+
+PROMPTS = [
+    "What is the capital of France?",
+    "Give me a tip for sleeping better.",
+    "Explain what a neural network is.",
+    "Suggest a name for a pet turtle.",
+    "How do I boil an egg?",
+    "What's a good stretch for my back?",
+]
+
+
+def _run(batching: bool, clients: int, requests: int):
+    os.environ["LLM_BATCHING"] = "1" if batching else "0"
+    latencies, tokens = [], 0
+
+    def one(i: int):
+        reply = llm.generate_response(PROMPTS[i % len(PROMPTS)], [], session_id=f"bench-{i % clients}")
+        return time.perf_counter(), len(llm._tokenizer(reply, add_special_tokens=False).input_ids)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients if batching else 1) as pool:
+        # Latency is measured from submission, so time spent queued behind other clients counts.
+        submitted = [(time.perf_counter(), pool.submit(one, i)) for i in range(clients * requests)]
+        for start, fut in submitted:
+            end, n = fut.result()
+            latencies.append(end - start)
+            tokens += n
+    wall = time.perf_counter() - t0
+    latencies.sort()
+    name = "batched" if batching else "serial"
+    print(f"{name:<8} {tokens / wall:7.1f} tok/s  {len(latencies) / wall:5.2f} req/s  "
+          f"latency p50={statistics.median(latencies):6.2f}s p99={latencies[int(0.99 * (len(latencies) - 1))]:6.2f}s")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=8)
+    ap.add_argument("--requests", type=int, default=4, help="requests per client")
+    args = ap.parse_args()
+    os.environ.setdefault("LLM_MAX_BATCH", str(args.clients))
+
+    llm.generate_response("warm up", [])
+    _run(False, args.clients, args.requests)
+    _run(True, args.clients, args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Microbenchmark: per-utterance TTS latency and CPU time, old vs new.
+
+"legacy" is the previous tts_to_wav_bytes (new pyttsx3 engine + TemporaryDirectory +
+pydub/ffmpeg decode and re-encode per call); "worker" is the persistent engine in tts.py.
+CPU time includes child processes (ffmpeg) where the OS reports it.
+
+Usage:
+  python bench_tts.py --runs 10
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import statistics
+import tempfile
+import time
+
+import pyttsx3
+from pydub import AudioSegment
+
+os.environ.setdefault("TTS_CACHE_MB", "0")  # measure synthesis, not cache hits
+import tts  # noqa: E402
+
+PHRASES = [
+    "Hello, how can I help you today?",
+    "The weather is sunny with a light breeze.",
+    "Sorry, I did not catch that. Could you repeat it?",
+    "Sure, I have set a reminder for tomorrow at nine.",
+]
+
+
+def legacy_tts_to_wav_bytes(text: str) -> bytes:
+    engine = pyttsx3.init()
+    with tempfile.TemporaryDirectory() as td:
+        out_path = os.path.join(td, "out.wav")
+        engine.save_to_file(text, out_path)
+        engine.runAndWait()
+        seg = AudioSegment.from_file(out_path)
+        buf = io.BytesIO()
+        seg.export(buf, format="wav")
+        return buf.getvalue()
+
+
+def _cpu_seconds() -> float:
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def bench(name, fn, runs: int):
+    fn(PHRASES[0])  # warm-up (engine init, first ffmpeg spawn)
+    wall, cpu = [], []
+    for i in range(runs):
+        text = PHRASES[i % len(PHRASES)]
+        c0, t0 = _cpu_seconds(), time.perf_counter()
+        fn(text)
+        wall.append(time.perf_counter() - t0)
+        cpu.append(_cpu_seconds() - c0)
+    print(f"{name:<8} latency p50={statistics.median(wall) * 1000:7.1f} ms  "
+          f"mean={statistics.mean(wall) * 1000:7.1f} ms  cpu/utt={statistics.mean(cpu) * 1000:7.1f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=10)
+    args = ap.parse_args()
+    bench("legacy", legacy_tts_to_wav_bytes, args.runs)
+    bench("worker", tts.tts_to_wav_bytes, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compare ASR backends for accuracy and latency over a folder of WAVs.
+
+For every ``*.wav`` in the folder each backend transcribes the clip; if ``<name>.txt``
+sits next to it, it is used as the reference transcript for WER. Without references,
+the first backend's output is used as the reference (i.e. agreement with it).
+
+Usage:
+  python compare_asr.py ./samples --backends whisper,ctranslate2
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import re
+import time
+
+import asr
+
+
+def _words(text: str):
+    return re.findall(r"[\w']+", text.lower())
+
+
+def word_errors(ref: str, hyp: str) -> tuple:
+    r, h = _words(ref), _words(hyp)
+    prev = list(range(len(h) + 1))
+    for i, rw in enumerate(r, 1):
+        cur = [i] + [0] * len(h)
+        for j, hw in enumerate(h, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (rw != hw))
+        prev = cur
+    return prev[-1], len(r)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("wav_dir")
+    ap.add_argument("--backends", default="whisper,ctranslate2")
+    ap.add_argument("--language", default=None)
+    args = ap.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.wav_dir, "*.wav")))
+    if not paths:
+        raise SystemExit(f"no .wav files in {args.wav_dir}")
+    clips = {}
+    for p in paths:
+        with open(p, "rb") as f:
+            clips[p] = asr._bytes_to_mono16k_float32(f.read())
+    audio_seconds = sum(len(a) for a in clips.values()) / 16000.0
+    refs = {}
+    for p in paths:
+        txt = os.path.splitext(p)[0] + ".txt"
+        if os.path.exists(txt):
+            with open(txt, encoding="utf-8") as f:
+                refs[p] = f.read()
+
+    model_name = os.getenv("ASR_MODEL", "small")
+    outputs = {}
+    print(f"{len(paths)} files, {audio_seconds:.1f}s of audio, model={model_name}, device={asr._DEVICE}")
+    for name in args.backends.split(","):
+        t0 = time.perf_counter()
+        backend = asr._BACKENDS[name](model_name)
+        load_s = time.perf_counter() - t0
+        backend.transcribe(next(iter(clips.values())), args.language)  # warm-up
+        outputs[name] = {}
+        t0 = time.perf_counter()
+        for p, audio in clips.items():
+            outputs[name][p] = backend.transcribe(audio, args.language)
+        total = time.perf_counter() - t0
+        print(f"{name:<12} load={load_s:6.2f}s  total={total:7.2f}s  RTF={total / audio_seconds:.3f}")
+
+    baseline = args.backends.split(",")[0]
+    for name, hyps in outputs.items():
+        errors = words = 0
+        for p, hyp in hyps.items():
+            ref = refs.get(p, outputs[baseline][p])
+            e, n = word_errors(ref, hyp)
+            errors, words = errors + e, words + n
+        label = "WER" if refs else f"WER vs {baseline}"
+        print(f"{name:<12} {label}={errors / max(words, 1):.3f}")
+
+
+if __name__ == "__main__":
+    main()
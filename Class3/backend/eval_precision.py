@@ -0,0 +1,115 @@
+"""Compare LLM_PRECISION modes: resident memory, tokens/sec and output similarity to fp32.
+
+Each precision runs in its own subprocess so resident memory is measured cleanly.
+Generation is greedy on a fixed prompt set; similarity is the difflib ratio of each
+reply to the fp32 reply, averaged over prompts.
+
+Usage:
+  python eval_precision.py --precisions fp32,bf16,int8,4bit --max-new 64
+"""
+from __future__ import annotations
+
+import argparse
+import difflib
+import json
+import os
+import subprocess
+import sys
+import time
+
+PROMPTS = [
+    "What is the capital of Japan?",
+    "Give me two tips for staying focused while studying.",
+    "Explain photosynthesis in one sentence.",
+    "What should I pack for a weekend hiking trip?",
+    "Translate 'good morning' into Spanish.",
+    "Why is the sky blue?",
+]
+
+
+def _rss_mb() -> float:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2 ** 20
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        import resource  # peak, not current, but the best we have here
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _worker(precision: str, max_new: int) -> dict:
+    os.environ["LLM_PRECISION"] = precision
+    os.environ.pop("LLM_ARTIFACT", None)
+    import llm
+
+    base_rss = _rss_mb()
+    t0 = time.perf_counter()
+    llm._init_model()
+    load_s = time.perf_counter() - t0
+    rss = _rss_mb()
+
+    outputs, tokens, gen_s = [], 0, 0.0
+    for prompt in PROMPTS:
+        text = llm._build_prompt(prompt, [])
+        inputs = llm._tokenizer(text, return_tensors="pt").to(llm._model.device)
+        t0 = time.perf_counter()
+        out = llm._model.generate(
+            input_ids=inputs.input_ids, attention_mask=inputs.attention_mask,
+            max_new_tokens=max_new, do_sample=False, pad_token_id=llm._tokenizer.eos_token_id,
+        )
+        gen_s += time.perf_counter() - t0
+        new = out[0][inputs.input_ids.shape[1]:]
+        tokens += len(new)
+        outputs.append(llm._tokenizer.decode(new, skip_special_tokens=True).strip())
+    return {
+        "precision": precision,
+        "load_s": load_s,
+        "rss_mb": rss,
+        "model_rss_mb": rss - base_rss,
+        "tok_per_s": tokens / gen_s if gen_s else 0.0,
+        "outputs": outputs,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--precisions", default="fp32,bf16,int8,4bit")
+    ap.add_argument("--max-new", type=int, default=64)
+    ap.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        print(json.dumps(_worker(args.worker, args.max_new)))
+        return
+
+    precisions = args.precisions.split(",")
+    if "fp32" not in precisions:
+        precisions.insert(0, "fp32")  # the similarity reference
+    results = {}
+    for precision in precisions:
+        proc = subprocess.run(
+            [sys.executable, __file__, "--worker", precision, "--max-new", str(args.max_new)],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"{precision:<5} FAILED: {proc.stderr.strip().splitlines()[-1] if proc.stderr else proc.returncode}")
+            continue
+        results[precision] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    ref = results.get("fp32")
+    print(f"{'mode':<6}{'load s':>8}{'RSS MB':>9}{'model MB':>10}{'tok/s':>8}{'sim':>7}")
+    for precision, r in results.items():
+        sim = float("nan")
+        if ref:
+            sim = sum(difflib.SequenceMatcher(None, a, b).ratio()
+                      for a, b in zip(ref["outputs"], r["outputs"])) / len(PROMPTS)
+        print(f"{precision:<6}{r['load_s']:>8.2f}{r['rss_mb']:>9.0f}{r['model_rss_mb']:>10.0f}"
+              f"{r['tok_per_s']:>8.1f}{sim:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Length-prefixed binary framing for responses that mix text, metadata and audio.
+
+Each frame is::
+
+    u32 big-endian header length | UTF-8 JSON header | u32 big-endian payload length | payload
+
+The header always carries a ``type`` field; the payload is raw bytes (e.g. a WAV
+segment) and may be empty. No base64 anywhere.
+
+Clients opt in with ``Accept: application/x-voice-frames`` and may pick the audio codec
+with a parameter, e.g. ``Accept: application/x-voice-frames; codec=opus`` (wav, flac or
+opus; see audio_codec.py). A reply is, in order:
+
+  {"type": "user_text", "text": ...}
+  {"type": "audio", "index": i, "text": ..., "format": ..., "sample_rate": ..., "channels": ...} + audio
+  {"type": "end", "text": full_reply}
+
+``/chat`` sends one audio frame, ``/chat/stream`` one per sentence.
+"""
+from __future__ import annotations
+
+import json
+import struct
+from typing import Iterator, Optional, Tuple
+
+MEDIA_TYPE = "application/x-voice-frames"
+
+_LEN = struct.Struct(">I")
+
+
+def encode_frame(header: dict, payload: bytes = b"") -> bytes:
+    head = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return b"".join((_LEN.pack(len(head)), head, _LEN.pack(len(payload)), payload))
+
+
+def decode_frames(data: bytes) -> Iterator[Tuple[dict, bytes]]:
+    """Split a complete response body back into (header, payload) pairs."""
+    view = memoryview(data)
+    pos = 0
+    while pos < len(view):
+        (hlen,) = _LEN.unpack_from(view, pos)
+        pos += _LEN.size
+        header = json.loads(bytes(view[pos:pos + hlen]).decode("utf-8"))
+        pos += hlen
+        (plen,) = _LEN.unpack_from(view, pos)
+        pos += _LEN.size
+        yield header, bytes(view[pos:pos + plen])
+        pos += plen
+
+
+def accepted_codec(accept: Optional[str]) -> Optional[str]:
+    """Audio codec requested for a framed reply, or None if the client doesn't accept frames."""
+    for item in (accept or "").split(","):
+        media, *params = (p.strip() for p in item.split(";"))
+        if media.lower() != MEDIA_TYPE:
+            continue
+        options = dict(p.split("=", 1) for p in params if "=" in p)
+        try:
+            if float(options.get("q", "1")) <= 0:
+                return None
+        except ValueError:
+            pass
+        return options.get("codec", "wav").strip().strip('"').lower()
+    return None
+
+
+def encode_reply(user_text: str, assistant_text: str, audio: bytes, audio_info: dict) -> bytes:
+    """A complete single-utterance reply: user_text, one audio frame, end."""
+    return b"".join((
+        encode_frame({"type": "user_text", "text": user_text}),
+        encode_frame({"type": "audio", "index": 0, "text": assistant_text, **audio_info}, audio),
+        encode_frame({"type": "end", "text": assistant_text}),
+    ))
@@ -1,8 +1,21 @@
 from __future__ import annotations
+import copy
+import functools
 import os
-from typing import List, Tuple, Optional
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple, Optional
 
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+import metrics
+
+if TYPE_CHECKING:  # annotations only; the runtime import stays lazy (see below)
+    from transformers import DynamicCache
+
+# torch/transformers are imported inside the functions that need them: importing them costs
+# seconds, and keeping them off the module import path lets the server start (and the
+# warm-up load all stages in parallel) instead of paying that on `import llm`.
 
 _SYSTEM_PROMPT = """You are a concise, helpful voice assistant. 
 Answer clearly, keep responses brief unless asked for details.
@@ -12,14 +25,63 @@ _tokenizer = None
 _model = None
 _pipe = None
 
+_INIT_LOCK = threading.Lock()
+
+# LLM_PRECISION: fp32 (default) | bf16 | int8 (torch dynamic quantization) | 4bit (optimum-quanto)
+_PRECISIONS = ("fp32", "bf16", "int8", "4bit")
+
+def _load_model(model_name: str, use_auth_token: Optional[str]):
+    """Load from LLM_ARTIFACT (a torch.save'd model, mmap-loaded) if set, else from the hub.
+
+    Hub loads use low_cpu_mem_usage, so safetensors weights are mmapped straight into the
+    model instead of being materialized twice.
+    """
+    import torch
+    from transformers import AutoModelForCausalLM
+
+    artifact = os.getenv("LLM_ARTIFACT")
+    if artifact and os.path.exists(artifact):
+        return torch.load(artifact, mmap=True, weights_only=False)  # saved already quantized
+    precision = os.getenv("LLM_PRECISION", "fp32").lower()
+    if precision not in _PRECISIONS:
+        raise ValueError(f"LLM_PRECISION must be one of {_PRECISIONS}, got {precision!r}")
+    model = AutoModelForCausalLM.from_pretrained(
+        model_name,
+        use_auth_token=use_auth_token,
+        low_cpu_mem_usage=True,
+        torch_dtype=torch.bfloat16 if precision == "bf16" else torch.float32,
+    )
+    return _quantize(model, precision)
+
+def _quantize(model, precision: str):
+    import torch
+
+    if precision == "int8":
+        # Dynamic int8: Linear weights stored as int8, activations quantized on the fly (CPU).
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if precision == "4bit":
+        # Weight-only int4 via optimum-quanto, which has CPU kernels (bitsandbytes is CUDA-first).
+        from optimum.quanto import freeze, qint4, quantize
+        quantize(model, weights=qint4)
+        freeze(model)
+    return model
+
 def _init_model():
-    global _tokenizer, _model, _pipe
     if _pipe is not None:
         return _pipe
+    with _INIT_LOCK:
+        if _pipe is not None:
+            return _pipe
+        return _init_model_locked()
+
+def _init_model_locked():
+    global _tokenizer, _model, _pipe
+    from transformers import AutoTokenizer, pipeline
+
     model_name = os.getenv("LLM_MODEL", "TinyLlama/TinyLlama-1.1B-Chat-v1.0")
     use_auth_token = os.getenv("HF_TOKEN") or None
     _tokenizer = AutoTokenizer.from_pretrained(model_name, use_auth_token=use_auth_token)
-    _model = AutoModelForCausalLM.from_pretrained(model_name, use_auth_token=use_auth_token)
+    _model = _load_model(model_name, use_auth_token)
     _pipe = pipeline(
         "text-generation",
         model=_model,
@@ -30,12 +92,17 @@ def _init_model():
 
 def _history_to_messages(history: List[Tuple[str, str]], user_text: str):
     messages = [{"role": "system", "content": _SYSTEM_PROMPT}]
-    for u, a in history[-5:]:
+    for u, a in history:  # already bounded by memory (turn cap / token budget)
         messages.append({"role": "user", "content": u})
         messages.append({"role": "assistant", "content": a})
     messages.append({"role": "user", "content": user_text})
     return messages
 
+@functools.lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """Length of ``text`` in the LLM's tokens (memory's MEMORY_MAX_TOKENS budget)."""
+    return len(_init_model().tokenizer(text, add_special_tokens=False).input_ids)
+
 def _apply_chat_template(tokenizer, messages: list[str], add_generation_prompt: bool=True) -> Optional[str]:
     if hasattr(tokenizer, "apply_chat_template") and callable(getattr(tokenizer, "apply_chat_template")):
         try:
@@ -44,34 +111,300 @@ def _apply_chat_template(tokenizer, messages: list[str], add_generation_prompt:
             return None
     return None
 
-def generate_response(user_text: str, history: List[Tuple[str, str]]) -> str:
-    if not user_text or not user_text.strip():
-        user_text = "(no input detected)"
-    pipe = _init_model()
-
+def _build_prompt(user_text: str, history: List[Tuple[str, str]]) -> str:
     messages = _history_to_messages(history, user_text)
     prompt = _apply_chat_template(_pipe.tokenizer, messages)
     if prompt is None:
         # Fallback manual prompt
-        convo = "\n".join([f"User: {u}\nAssistant: {a}" for u, a in history[-5:]])
+        convo = "\n".join([f"User: {u}\nAssistant: {a}" for u, a in history])
         prompt = f"{_SYSTEM_PROMPT}\n{convo}\nUser: {user_text}\nAssistant:"
+    return prompt
 
-    max_new = int(os.getenv("LLM_MAX_NEW", "128"))
-    temperature = float(os.getenv("LLM_TEMP", "0.7"))
-
-    out = pipe(
-        prompt,
-        max_new_tokens=max_new,
+def _sampling_kwargs() -> dict:
+    return dict(
+        max_new_tokens=int(os.getenv("LLM_MAX_NEW", "128")),
         do_sample=True,
-        temperature=temperature,
+        temperature=float(os.getenv("LLM_TEMP", "0.7")),
         top_p=0.9,
         eos_token_id=_pipe.tokenizer.eos_token_id,
         pad_token_id=_pipe.tokenizer.eos_token_id,
-    )[0]["generated_text"]
+    )
+
+# ---- KV-cache reuse across turns ----
+# Each session keeps the token ids and past key/values of its last turn. The next prompt
+# (system + history + new user turn) shares a long prefix with it, so only the tokens after
+# the common prefix are prefilled. New sessions start from a cached system-prompt prefix.
+# Env:
+#   LLM_KV_CACHE    : 1 to reuse KV caches across turns (default: 1)
+#   LLM_KV_CACHE_MB : memory budget for per-session caches, LRU-evicted (default: 256)
+
+class _KVEntry:
+    __slots__ = ("ids", "cache", "nbytes")
+
+    def __init__(self, ids: List[int], cache: "DynamicCache"):
+        self.ids = ids
+        self.cache = cache
+        self.nbytes = sum(
+            k.numel() * k.element_size() + v.numel() * v.element_size()
+            for k, v in zip(cache.key_cache, cache.value_cache)
+        )
+
+_KV: "OrderedDict[str, _KVEntry]" = OrderedDict()
+_KV_BYTES = 0
+_KV_LOCK = threading.Lock()
+_PREFIX: Optional[_KVEntry] = None
+
+def _system_prefix() -> _KVEntry:
+    """KV cache of the system prompt alone, shared (copied) by every new session."""
+    global _PREFIX
+    with _KV_LOCK:
+        if _PREFIX is not None:
+            return _PREFIX
+    text = _apply_chat_template(_tokenizer, [{"role": "system", "content": _SYSTEM_PROMPT}],
+                                add_generation_prompt=False) or _SYSTEM_PROMPT
+    import torch
+    from transformers import DynamicCache
+
+    ids = _tokenizer(text, return_tensors="pt").input_ids.to(_model.device)
+    with torch.no_grad():
+        cache = _model(input_ids=ids, past_key_values=DynamicCache(), use_cache=True).past_key_values
+    entry = _KVEntry(ids[0].tolist(), cache)
+    with _KV_LOCK:
+        if _PREFIX is None:
+            _PREFIX = entry
+        return _PREFIX
+
+def _take_session(session_id: Optional[str]) -> Optional[_KVEntry]:
+    global _KV_BYTES
+    if session_id is None:
+        return None
+    with _KV_LOCK:
+        entry = _KV.pop(session_id, None)
+        if entry is not None:
+            _KV_BYTES -= entry.nbytes
+        return entry
+
+def _store_session(session_id: Optional[str], entry: _KVEntry) -> None:
+    global _KV_BYTES
+    if session_id is None:
+        return
+    budget = int(float(os.getenv("LLM_KV_CACHE_MB", "256")) * 1024 * 1024)
+    if entry.nbytes > budget:
+        return
+    with _KV_LOCK:
+        old = _KV.pop(session_id, None)
+        if old is not None:
+            _KV_BYTES -= old.nbytes
+        _KV[session_id] = entry
+        _KV_BYTES += entry.nbytes
+        while _KV_BYTES > budget:
+            _, evicted = _KV.popitem(last=False)
+            _KV_BYTES -= evicted.nbytes
+
+def _common_prefix_len(a: List[int], b: List[int]) -> int:
+    n = min(len(a), len(b))
+    for i in range(n):
+        if a[i] != b[i]:
+            return i
+    return n
+
+def _reusable_cache(session_id: Optional[str], prompt_ids: List[int]) -> Tuple["DynamicCache", int]:
+    """Cache holding the longest reusable prefix of ``prompt_ids``, and that prefix's length."""
+    from transformers import DynamicCache
+
+    base = _take_session(session_id)
+    owned = base is not None  # a session entry can be mutated; the shared prefix must be copied
+    if base is None:
+        base = _system_prefix()
+    # Keep at least one prompt token to prefill so there are logits to start from.
+    reuse = min(_common_prefix_len(base.ids, prompt_ids), len(prompt_ids) - 1)
+    if reuse <= 0:
+        return DynamicCache(), 0
+    cache = base.cache if owned else copy.deepcopy(base.cache)
+    cache.crop(reuse)
+    return cache, reuse
 
-    # If chat template was used, generated_text includes the prompt. Extract tail after prompt.
-    if out.startswith(prompt):
-        out = out[len(prompt):]
+class _PhaseTimer:
+    """Streamer hook that splits a generate() call into prefill and decode time.
+
+    generate() calls put() once with the prompt and then once per new token, so the
+    second put() marks the first generated token.
+    """
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.first: Optional[float] = None
+        self.calls = 0
+
+    def put(self, value) -> None:
+        self.calls += 1
+        if self.calls == 2:
+            self.first = time.perf_counter()
+
+    def end(self) -> None:
+        now = time.perf_counter()
+        first = self.first or now
+        metrics.observe("llm_prefill", first - self.t0)
+        metrics.observe("llm_decode", now - first)
+
+def _generate_with_kv_cache(prompt: str, session_id: Optional[str]) -> str:
+    import torch
+
+    ids = _tokenizer(prompt, return_tensors="pt").input_ids.to(_model.device)
+    prompt_ids = ids[0].tolist()
+
+    cache, _reuse = _reusable_cache(session_id, prompt_ids)
+    out = _model.generate(
+        input_ids=ids,
+        attention_mask=torch.ones_like(ids),
+        past_key_values=cache,
+        return_dict_in_generate=True,
+        streamer=_PhaseTimer(),
+        **_sampling_kwargs(),
+    )
+    seq = out.sequences[0]
+    cache = out.past_key_values
+    _store_session(session_id, _KVEntry(seq[:cache.get_seq_length()].tolist(), cache))
+    return _tokenizer.decode(seq[ids.shape[1]:], skip_special_tokens=True)
+
+def generate_response(user_text: str, history: List[Tuple[str, str]], session_id: Optional[str] = None) -> str:
+    if not user_text or not user_text.strip():
+        user_text = "(no input detected)"
+    pipe = _init_model()
+
+    with metrics.span("prompt_build"):
+        prompt = _build_prompt(user_text, history)
+
+    if os.getenv("LLM_BATCHING", "0") == "1":
+        import llm_batch
+        out = llm_batch.generate(prompt, session_id)
+    elif os.getenv("LLM_KV_CACHE", "1") == "1":
+        out = _generate_with_kv_cache(prompt, session_id)
+    else:
+        out = pipe(prompt, streamer=_PhaseTimer(), **_sampling_kwargs())[0]["generated_text"]
+
+        # If chat template was used, generated_text includes the prompt. Extract tail after prompt.
+        if out.startswith(prompt):
+            out = out[len(prompt):]
 
     # Basic trimming
     return out.strip().split("\n")[0].strip() or "(no output)"
+
+# A sentence ends at . ! ? followed by whitespace (so "3.5" is not split), or at a CJK terminator.
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s|[。！？]+")
+
+def _pop_sentences(buf: str) -> Tuple[List[str], str]:
+    sentences = []
+    while True:
+        m = _SENTENCE_END.search(buf)
+        if not m:
+            return sentences, buf
+        sentence = buf[:m.end()].strip()
+        if sentence:
+            sentences.append(sentence)
+        buf = buf[m.end():]
+
+def stream_sentences(user_text: str, history: List[Tuple[str, str]], session_id: Optional[str] = None,
+                     stop: Optional[threading.Event] = None) -> Iterator[str]:
+    """Like generate_response, but yield the reply sentence by sentence while it is generated.
+
+    Uses the same first-line trimming as generate_response: generation is stopped as soon
+    as the reply reaches a newline, so no tokens are wasted on text that would be dropped.
+    Setting ``stop`` from another thread ends generation at the next token. With
+    LLM_KV_CACHE=1 (default) the session's KV cache is reused and updated, as in
+    generate_response.
+    """
+    from transformers import StoppingCriteriaList, TextIteratorStreamer
+
+    if not user_text or not user_text.strip():
+        user_text = "(no input detected)"
+    _init_model()
+
+    with metrics.span("prompt_build"):
+        prompt = _build_prompt(user_text, history)
+    inputs = _tokenizer(prompt, return_tensors="pt").to(_model.device)
+    streamer = TextIteratorStreamer(_tokenizer, skip_prompt=True, skip_special_tokens=True)
+    stop = stop or threading.Event()
+    errors: List[BaseException] = []
+
+    use_kv = os.getenv("LLM_KV_CACHE", "1") == "1"
+
+    def _run():
+        try:
+            kwargs = {}
+            if use_kv:
+                cache, _reuse = _reusable_cache(session_id, inputs.input_ids[0].tolist())
+                kwargs = {"past_key_values": cache, "return_dict_in_generate": True}
+            out = _model.generate(
+                input_ids=inputs.input_ids,
+                attention_mask=inputs.attention_mask,
+                streamer=streamer,
+                stopping_criteria=StoppingCriteriaList([lambda input_ids, scores, **kw: stop.is_set()]),
+                **kwargs,
+                **_sampling_kwargs(),
+            )
+            if use_kv:
+                cache = out.past_key_values
+                _store_session(session_id, _KVEntry(out.sequences[0][:cache.get_seq_length()].tolist(), cache))
+        except BaseException as e:  # surface in the consumer instead of hanging the streamer
+            errors.append(e)
+            streamer.end()
+
+    thread = threading.Thread(target=_run, name="llm-stream", daemon=True)
+    t0 = time.perf_counter()
+    first: Optional[float] = None
+    thread.start()
+
+    buf = ""
+    emitted = False
+    try:
+        for piece in streamer:
+            if first is None:
+                first = time.perf_counter()
+                metrics.observe("llm_prefill", first - t0)
+            buf += piece
+            if not emitted:
+                buf = buf.lstrip()
+                if not buf:
+                    continue
+            newline = buf.find("\n")
+            if newline >= 0:
+                buf = buf[:newline]
+                stop.set()
+            sentences, buf = _pop_sentences(buf)
+            for sentence in sentences:
+                emitted = True
+                yield sentence
+            if stop.is_set():
+                break
+    finally:
+        stop.set()
+        thread.join()
+        if first is not None:
+            metrics.observe("llm_decode", time.perf_counter() - first)
+    if errors:
+        raise errors[0]
+
+    tail = buf.strip()
+    if tail:
+        yield tail
+    elif not emitted:
+        yield "(no output)"
+
+def warmup() -> Dict[str, float]:
+    """Load the model, build the shared system-prompt KV cache and run one tiny generation."""
+    t0 = time.perf_counter()
+    _init_model()
+    t1 = time.perf_counter()
+    _system_prefix()
+    inputs = _tokenizer("Hello", return_tensors="pt").to(_model.device)
+    _model.generate(input_ids=inputs.input_ids, attention_mask=inputs.attention_mask,
+                    max_new_tokens=2, do_sample=False, pad_token_id=_tokenizer.eos_token_id)
+    return {"load": t1 - t0, "warm": time.perf_counter() - t1}
+
+def save_artifact(path: str) -> None:
+    """Serialize the loaded (and possibly quantized) model for fast mmap loading via LLM_ARTIFACT."""
+    import torch
+
+    _init_model()
+    torch.save(_model, path)
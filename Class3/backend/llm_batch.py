@@ -0,0 +1,244 @@
+"""Continuous-batching generation scheduler around llm._model.
+
+One background thread owns a running batch. New requests are prefilled on their own
+(reusing the session KV cache from llm.py) and joined into the batch at the next token
+boundary; every step decodes one token for all active sequences at once, and sequences
+that hit EOS, the first newline (which generate_response trims anyway) or max_new_tokens
+are retired immediately instead of waiting for the longest one.
+
+The batched KV cache is left-padded: each row keeps its own positions, and a 2-D
+attention mask hides the padding. Admission pads to a common length, retirement drops
+rows and any leading columns that only held padding.
+
+llm.generate_response routes here when LLM_BATCHING=1; its signature is unchanged.
+
+Env:
+  LLM_BATCHING  : 1 to enable continuous batching (default: 0)
+  LLM_MAX_BATCH : max sequences decoded together (default: 8)
+"""
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional
+
+import torch
+from transformers import DynamicCache
+
+import llm
+import metrics
+
+
+class _Seq:
+    __slots__ = ("prompt_ids", "session_id", "future", "max_new", "generated", "started", "joined")
+
+    def __init__(self, prompt_ids: List[int], session_id: Optional[str], future: Future, max_new: int):
+        self.prompt_ids = prompt_ids
+        self.session_id = session_id
+        self.future = future
+        self.max_new = max_new
+        self.generated: List[int] = []
+        self.started = False  # seen a non-blank token yet
+        self.joined = 0.0     # when prefill finished and decoding began
+
+
+def _sample(logits: torch.Tensor, temperature: float, top_p: float) -> torch.Tensor:
+    """Temperature + nucleus sampling for a (B, V) batch of logits."""
+    if temperature <= 0:
+        return logits.argmax(dim=-1)
+    probs = torch.softmax(logits.float() / temperature, dim=-1)
+    sorted_probs, sorted_idx = probs.sort(dim=-1, descending=True)
+    # Drop tokens once the mass before them already exceeds top_p (always keep the first).
+    drop = sorted_probs.cumsum(dim=-1) - sorted_probs > top_p
+    sorted_probs = sorted_probs.masked_fill(drop, 0.0)
+    choice = torch.multinomial(sorted_probs, num_samples=1)
+    return sorted_idx.gather(-1, choice).squeeze(-1)
+
+
+def _pad_left(t: torch.Tensor, n: int) -> torch.Tensor:
+    if n == 0:
+        return t
+    pad = t.new_zeros(t.shape[:-2] + (n, t.shape[-1]))
+    return torch.cat([pad, t], dim=-2)
+
+
+class BatchScheduler(threading.Thread):
+    def __init__(self, max_batch: int):
+        super().__init__(name="llm-batcher", daemon=True)
+        self.max_batch = max_batch
+        self.incoming: "queue.Queue[_Seq]" = queue.Queue()
+        self.active: List[_Seq] = []
+        self.cache: Optional[DynamicCache] = None  # (B, heads, L, dim) per layer, left-padded
+        self.mask: Optional[torch.Tensor] = None   # (B, L) 1 = real token
+
+    def submit(self, prompt: str, session_id: Optional[str]) -> Future:
+        fut: Future = Future()
+        ids = llm._tokenizer(prompt).input_ids
+        self.incoming.put(_Seq(ids, session_id, fut, int(os.getenv("LLM_MAX_NEW", "128"))))
+        return fut
+
+    # ---- batch bookkeeping ----
+
+    def _join(self, seq: _Seq, cache: DynamicCache) -> None:
+        length = cache.get_seq_length()
+        if self.cache is None:
+            self.cache = cache
+            self.mask = torch.ones(1, length, dtype=torch.long, device=llm._model.device)
+        else:
+            cur = self.mask.shape[1]
+            width = max(cur, length)
+            for layer in range(len(self.cache.key_cache)):
+                self.cache.key_cache[layer] = torch.cat([
+                    _pad_left(self.cache.key_cache[layer], width - cur),
+                    _pad_left(cache.key_cache[layer], width - length)], dim=0)
+                self.cache.value_cache[layer] = torch.cat([
+                    _pad_left(self.cache.value_cache[layer], width - cur),
+                    _pad_left(cache.value_cache[layer], width - length)], dim=0)
+            row = torch.ones(1, length, dtype=torch.long, device=self.mask.device)
+            self.mask = torch.cat([
+                torch.nn.functional.pad(self.mask, (width - cur, 0)),
+                torch.nn.functional.pad(row, (width - length, 0))], dim=0)
+            self.cache._seen_tokens = width
+        self.active.append(seq)
+
+    def _row_cache(self, row: int) -> DynamicCache:
+        start = int(self.mask.shape[1] - self.mask[row].sum())
+        return DynamicCache.from_legacy_cache(tuple(
+            (k[row:row + 1, :, start:].contiguous(), v[row:row + 1, :, start:].contiguous())
+            for k, v in zip(self.cache.key_cache, self.cache.value_cache)
+        ))
+
+    def _retire(self, rows: List[int]) -> None:
+        for row in rows:
+            seq = self.active[row]
+            if seq.session_id is not None and os.getenv("LLM_KV_CACHE", "1") == "1":
+                # The cache holds the prompt and every generated token except the last one.
+                ids = seq.prompt_ids + seq.generated[:-1]
+                llm._store_session(seq.session_id, llm._KVEntry(ids, self._row_cache(row)))
+            metrics.observe("llm_decode", time.perf_counter() - seq.joined)
+            seq.future.set_result(llm._tokenizer.decode(seq.generated, skip_special_tokens=True))
+        keep = [i for i in range(len(self.active)) if i not in set(rows)]
+        self.active = [self.active[i] for i in keep]
+        if not keep:
+            self.cache, self.mask = None, None
+            return
+        index = torch.tensor(keep, device=self.mask.device)
+        mask = self.mask.index_select(0, index)
+        first = int((mask.sum(dim=0) > 0).nonzero()[0])  # drop columns that are padding in every row
+        self.mask = mask[:, first:]
+        for layer in range(len(self.cache.key_cache)):
+            self.cache.key_cache[layer] = self.cache.key_cache[layer].index_select(0, index)[:, :, first:]
+            self.cache.value_cache[layer] = self.cache.value_cache[layer].index_select(0, index)[:, :, first:]
+        self.cache._seen_tokens = self.mask.shape[1]
+
+    def _finished(self, seq: _Seq, token: int) -> bool:
+        if token == llm._tokenizer.eos_token_id or len(seq.generated) >= seq.max_new:
+            return True
+        piece = llm._tokenizer.decode([token])
+        if seq.started and "\n" in piece:
+            return True  # generate_response keeps only the first line
+        seq.started = seq.started or bool(piece.strip())
+        return False
+
+    # ---- model calls ----
+
+    @torch.no_grad()
+    def _admit(self, seq: _Seq, temperature: float, top_p: float) -> None:
+        t0 = time.perf_counter()
+        if os.getenv("LLM_KV_CACHE", "1") == "1":
+            cache, reuse = llm._reusable_cache(seq.session_id, seq.prompt_ids)
+        else:
+            cache, reuse = DynamicCache(), 0
+        ids = torch.tensor([seq.prompt_ids[reuse:]], device=llm._model.device)
+        out = llm._model(
+            input_ids=ids,
+            past_key_values=cache,
+            use_cache=True,
+            cache_position=torch.arange(reuse, len(seq.prompt_ids), device=ids.device),
+        )
+        token = int(_sample(out.logits[:, -1, :], temperature, top_p)[0])
+        seq.generated.append(token)
+        seq.joined = time.perf_counter()
+        metrics.observe("llm_prefill", seq.joined - t0)
+        self._join(seq, out.past_key_values)
+        if self._finished(seq, token):
+            self._retire([len(self.active) - 1])
+
+    @torch.no_grad()
+    def _step(self, temperature: float, top_p: float) -> None:
+        past = self.mask.shape[1]
+        positions = self.mask.sum(dim=1, keepdim=True)  # each row's next position
+        self.mask = torch.cat([self.mask, self.mask.new_ones(len(self.active), 1)], dim=1)
+        input_ids = torch.tensor([[seq.generated[-1]] for seq in self.active], device=self.mask.device)
+        out = llm._model(
+            input_ids=input_ids,
+            attention_mask=self.mask,
+            position_ids=positions,
+            past_key_values=self.cache,
+            use_cache=True,
+            cache_position=torch.tensor([past], device=self.mask.device),
+        )
+        self.cache = out.past_key_values
+        tokens = _sample(out.logits[:, -1, :], temperature, top_p).tolist()
+        done = []
+        for row, (seq, token) in enumerate(zip(self.active, tokens)):
+            seq.generated.append(token)
+            if self._finished(seq, token):
+                done.append(row)
+        if done:
+            self._retire(done)
+
+    def _fail_all(self, exc: BaseException) -> None:
+        for seq in self.active:
+            if not seq.future.done():
+                seq.future.set_exception(exc)
+        self.active, self.cache, self.mask = [], None, None
+
+    def run(self):
+        while True:
+            # Block only when idle; otherwise admit whatever arrived since the last token.
+            new = [self.incoming.get()] if not self.active else []
+            while len(self.active) + len(new) < self.max_batch:
+                try:
+                    new.append(self.incoming.get_nowait())
+                except queue.Empty:
+                    break
+            temperature = float(os.getenv("LLM_TEMP", "0.7"))
+            top_p = 0.9
+            for seq in new:
+                if not seq.future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    self._admit(seq, temperature, top_p)
+                except BaseException as e:
+                    seq.future.set_exception(e)
+            if not self.active:
+                continue
+            try:
+                self._step(temperature, top_p)
+            except BaseException as e:
+                self._fail_all(e)
+
+
+_SCHEDULER: Optional[BatchScheduler] = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def _get_scheduler() -> BatchScheduler:
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        with _SCHEDULER_LOCK:
+            if _SCHEDULER is None:
+                scheduler = BatchScheduler(int(os.getenv("LLM_MAX_BATCH", "8")))
+                scheduler.start()
+                _SCHEDULER = scheduler
+    return _SCHEDULER
+
+
+def generate(prompt: str, session_id: Optional[str] = None) -> str:
+    """Blocking client API: queue ``prompt`` and wait for its completion text."""
+    llm._init_model()
+    return _get_scheduler().submit(prompt, session_id).result()
@@ -0,0 +1,111 @@
+"""Small load-test harness for POST /chat.
+
+Fires ``--requests`` calls with ``--concurrency`` parallel clients (one session id per
+client) and reports latency percentiles and throughput. Run it once against the old
+build and once against the new one to compare.
+
+Usage:
+  python loadtest.py --url http://127.0.0.1:8000/chat --concurrency 8 --requests 64 --text "hello"
+  python loadtest.py --audio sample.wav --concurrency 4 --requests 16
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+
+def _multipart(fields: dict, files: dict) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, (filename, data, ctype) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: {ctype}\r\n\r\n".encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def _one_request(url: str, session_id: str, text: Optional[str], audio: Optional[bytes], timeout: float):
+    fields = {"text": text} if text else {}
+    files = {"file": ("audio.wav", audio, "audio/wav")} if audio and not text else {}
+    body, ctype = _multipart(fields, files)
+    req = urllib.request.Request(
+        url, data=body, method="POST",
+        headers={"Content-Type": ctype, "X-Session-ID": session_id},
+    )
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = 0
+    return status, time.perf_counter() - t0
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default="http://127.0.0.1:8000/chat")
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--requests", type=int, default=16)
+    ap.add_argument("--text", default=None, help="send a text override (skips ASR)")
+    ap.add_argument("--audio", default=None, help="path to an audio file to upload")
+    ap.add_argument("--timeout", type=float, default=300.0)
+    args = ap.parse_args()
+
+    audio = None
+    if args.audio:
+        with open(args.audio, "rb") as f:
+            audio = f.read()
+    if not args.text and audio is None:
+        args.text = "Hello, who are you?"
+
+    sessions = [f"load-{i}" for i in range(args.concurrency)]
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(_one_request, args.url, sessions[i % args.concurrency], args.text, audio, args.timeout)
+            for i in range(args.requests)
+        ]
+        results = [f.result() for f in futures]
+    wall = time.perf_counter() - t0
+
+    ok = [lat for status, lat in results if status == 200]
+    busy = sum(1 for status, _ in results if status == 503)
+    failed = len(results) - len(ok) - busy
+
+    print(f"target      : {args.url} ({os.path.basename(args.audio) if args.audio else 'text'})")
+    print(f"requests    : {len(results)} (ok={len(ok)}, 503={busy}, failed={failed})")
+    print(f"concurrency : {args.concurrency}")
+    print(f"wall time   : {wall:.2f}s")
+    print(f"throughput  : {len(ok) / wall:.2f} req/s")
+    if ok:
+        print(f"latency p50 : {_percentile(ok, 50) * 1000:.0f} ms")
+        print(f"latency p99 : {_percentile(ok, 99) * 1000:.0f} ms")
+        print(f"latency mean: {statistics.mean(ok) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
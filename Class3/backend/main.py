@@ -1,25 +1,40 @@
 from __future__ import annotations
+import asyncio
 import io
 from typing import Optional
-from fastapi import FastAPI, UploadFile, File, Form, Header, Response
+from fastapi import Depends, FastAPI, UploadFile, File, Form, Header, Response
 from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 
+import audio_codec
+import response_cache
 from asr import transcribe_audio
+from framing import MEDIA_TYPE, accepted_codec, encode_reply
 from llm import generate_response
 from tts import tts_to_wav_bytes
 from memory import get_history, push_turn
+from metrics import install as install_metrics, span
+from ops import router as ops_router
+from streaming import router as streaming_router
+from warmup import lifespan
+from workers import admission, run_stage
+from ws_voice import router as ws_router
 
 load_dotenv()  # Load .env
 
-app = FastAPI(title="Voice Agent Backend", version="0.2.0" )
+app = FastAPI(title="Voice Agent Backend", version="0.2.0", lifespan=lifespan)
+app.include_router(streaming_router)
+app.include_router(ops_router)
+app.include_router(ws_router)
+install_metrics(app)
 
-@app.post("/chat")
+@app.post("/chat", dependencies=[Depends(admission)])
 async def chat_endpoint(
     response: Response,
     file: UploadFile = File(None),
     text: Optional[str] = Form(None),
-    x_session_id: Optional[str] = Header(default="default")
+    x_session_id: Optional[str] = Header(default="default"),
+    accept: Optional[str] = Header(default=None),
 ):
     # 1) ASR (or text override)
     if text and text.strip():
@@ -29,19 +44,29 @@ async def chat_endpoint(
             user_text = "(no audio, no text)"
         else:
             audio_bytes = await file.read()
-            user_text = transcribe_audio(audio_bytes)
+            user_text = await run_stage("asr", transcribe_audio, audio_bytes)
 
     # 2) Memory
-    history = get_history(x_session_id, max_turns=5)
+    with span("history"):
+        history = await asyncio.to_thread(get_history, x_session_id)
 
-    # 3) LLM
-    assistant_text = generate_response(user_text, history)
+    # 3) LLM + 4) TTS, unless the response cache (RESPONSE_CACHE=1) already has this question
+    cached = await response_cache.alookup(user_text, history)
+    if cached is not None:
+        assistant_text, wav_bytes = cached
+    else:
+        assistant_text = await run_stage("llm", generate_response, user_text, history, session_id=x_session_id)
+        wav_bytes = await run_stage("tts", tts_to_wav_bytes, assistant_text)
+        await response_cache.astore(user_text, history, assistant_text, wav_bytes)
 
     # Save turn
-    push_turn(x_session_id, user_text, assistant_text, max_turns=5)
-
-    # 4) TTS
-    wav_bytes = tts_to_wav_bytes(assistant_text)
+    await asyncio.to_thread(push_turn, x_session_id, user_text, assistant_text)
 
-    response.headers["X-Assistant-Text"] = assistant_text
-    return StreamingResponse(io.BytesIO(wav_bytes), media_type="audio/wav")
+    # 5) Framed binary reply (text + raw audio, optional FLAC/Opus) if the client accepts it
+    codec = accepted_codec(accept)
+    with span("encode"):
+        if codec is not None:
+            audio, info = await asyncio.to_thread(audio_codec.encode, wav_bytes, codec)
+            return Response(encode_reply(user_text, assistant_text, audio, info), media_type=MEDIA_TYPE)
+        response.headers["X-Assistant-Text"] = assistant_text
+        return StreamingResponse(io.BytesIO(wav_bytes), media_type="audio/wav")
@@ -1,102 +1,115 @@
 from __future__ import annotations
+import asyncio
 import io
+import logging
 import os
-import tempfile
-from datetime import datetime
 from typing import Optional
-from fastapi import FastAPI, UploadFile, File, Form, Header, Response
+from fastapi import Depends, FastAPI, UploadFile, File, Form, Header, Response
 from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 
+import audio_codec
+import response_cache
 from asr import transcribe_audio
+from audio_capture import capture as capture_audio
+from framing import MEDIA_TYPE, accepted_codec, encode_reply
 from llm import generate_response
 from tts import tts_to_wav_bytes
 from memory import get_history, push_turn
+from metrics import install as install_metrics, span
+from ops import router as ops_router
+from streaming import router as streaming_router
+from warmup import lifespan
+from workers import admission, run_stage
+from ws_voice import router as ws_router
 
 load_dotenv()  # Load .env
 
-# Create tmp directory if it doesn't exist
-TMP_DIR = os.path.join(os.path.dirname(__file__), "tmp")
-os.makedirs(TMP_DIR, exist_ok=True)
+# LOG_LEVEL=DEBUG restores the per-step request trace (and the per-stage span lines).
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+logger = logging.getLogger("voice.chat")
 
-app = FastAPI(title="Voice Agent Backend", version="0.2.0" )
+app = FastAPI(title="Voice Agent Backend", version="0.2.0", lifespan=lifespan)
+app.include_router(streaming_router)
+app.include_router(ops_router)
+app.include_router(ws_router)
+install_metrics(app)
 
-@app.post("/chat")
+@app.post("/chat", dependencies=[Depends(admission)])
 async def chat_endpoint(
     response: Response,
     file: UploadFile = File(None),
     text: Optional[str] = Form(None),
-    x_session_id: Optional[str] = Header(default="default")
+    x_session_id: Optional[str] = Header(default="default"),
+    accept: Optional[str] = Header(default=None),
 ):
-    print(f"[DEBUG] Request received - Session: {x_session_id}, File: {file.filename if file else None}, Text: {bool(text)}")
+    logger.debug("Request received - Session: %s, File: %s, Text: %s", x_session_id, file.filename if file else None, bool(text))
     
     # 1) ASR (or text override)
     if text and text.strip():
-        print(f"[DEBUG] Using text override: {text}")
+        logger.debug("Using text override: %s", text)
         user_text = text.strip()
     else:
         if file is None:
-            print("[DEBUG] No audio file or text provided")
+            logger.debug("No audio file or text provided")
             user_text = "(no audio, no text)"
         else:
             audio_bytes = await file.read()
-            print(f"[DEBUG] Processing audio file: {file.filename}, size: {len(audio_bytes)} bytes")
+            logger.debug("Processing audio file: %s, size: %d bytes", file.filename, len(audio_bytes))
             
-            # Save uploaded file to tmp folder
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            # Hand the upload to the background capture sink (sampled, never blocks)
             file_ext = os.path.splitext(file.filename or "audio.wav")[1] or ".wav"
-            upload_filename = f"upload_{timestamp}_{x_session_id}{file_ext}"
-            upload_path = os.path.join(TMP_DIR, upload_filename)
+            capture_audio("upload", x_session_id, audio_bytes, file_ext)
             
-            with open(upload_path, "wb") as f:
-                f.write(audio_bytes)
-            print(f"[DEBUG] Saved uploaded file: {upload_path}")
-            
-            user_text = transcribe_audio(audio_bytes)
-            print(f"[DEBUG] Transcribed text: {user_text}")
+            user_text = await run_stage("asr", transcribe_audio, audio_bytes)
+            logger.debug("Transcribed text: %s", user_text)
 
     # 2) Memory
-    history = get_history(x_session_id, max_turns=5)
+    with span("history"):
+        history = await asyncio.to_thread(get_history, x_session_id)
 
-    # 3) LLM
-    print("[DEBUG] Generating LLM response")
-    assistant_text = generate_response(user_text, history)
-    print(f"[DEBUG] Generated response: {assistant_text}")
+    # 3) LLM + 4) TTS, unless the response cache (RESPONSE_CACHE=1) already has this question
+    cached = await response_cache.alookup(user_text, history)
+    if cached is not None:
+        assistant_text, wav_bytes = cached
+        logger.debug("Response cache hit: %s", assistant_text)
+    else:
+        logger.debug("Generating LLM response")
+        assistant_text = await run_stage("llm", generate_response, user_text, history, session_id=x_session_id)
+        logger.debug("Generated response: %s", assistant_text)
 
-    # Save turn
-    push_turn(x_session_id, user_text, assistant_text, max_turns=5)
+        logger.debug("Converting to speech")
+        wav_bytes = await run_stage("tts", tts_to_wav_bytes, assistant_text)
+        logger.debug("Generated audio: %d bytes", len(wav_bytes))
+        await response_cache.astore(user_text, history, assistant_text, wav_bytes)
 
-    # 4) TTS
-    print("[DEBUG] Converting to speech")
-    wav_bytes = tts_to_wav_bytes(assistant_text)
-    print(f"[DEBUG] Generated audio: {len(wav_bytes)} bytes")
-    
-    # Save generated voice response to tmp folder
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    response_filename = f"response_{timestamp}_{x_session_id}.wav"
-    response_path = os.path.join(TMP_DIR, response_filename)
+    # Save turn
+    await asyncio.to_thread(push_turn, x_session_id, user_text, assistant_text)
     
-    with open(response_path, "wb") as f:
-        f.write(wav_bytes)
-    print(f"[DEBUG] Saved response audio: {response_path}")
+    # Hand the response audio to the capture sink
+    capture_audio("response", x_session_id, wav_bytes)
+
+    # Framed binary reply if the client accepts it (no header-encoded text)
+    codec = accepted_codec(accept)
+    if codec is not None:
+        with span("encode"):
+            audio, info = await asyncio.to_thread(audio_codec.encode, wav_bytes, codec)
+            logger.debug("Framed reply: %s, %d bytes", info["format"], len(audio))
+            return Response(encode_reply(user_text, assistant_text, audio, info), media_type=MEDIA_TYPE)
 
     # Ensure assistant_text is properly encoded for header
-    try:
-        import urllib.parse
-        # URL encode the text to handle special characters
-        encoded_text = urllib.parse.quote(assistant_text.replace('\n', ' ').replace('\r', ' '))
-        response.headers["X-Assistant-Text"] = encoded_text
-        print(f"[DEBUG] Original text: {assistant_text}")
-        print(f"[DEBUG] Encoded header: {encoded_text}")
-    except Exception as e:
-        print(f"[DEBUG] Header encoding error: {e}")
-        response.headers["X-Assistant-Text"] = urllib.parse.quote("Response generated successfully")
-    
-    # Verify audio data integrity
-    print(f"[DEBUG] Audio data type: {type(wav_bytes)}, length: {len(wav_bytes)}")
-    audio_stream = io.BytesIO(wav_bytes)
-    print(f"[DEBUG] Audio stream position: {audio_stream.tell()}")
-    audio_stream.seek(0)  # Ensure stream starts at beginning
-    
-    print("[DEBUG] Request completed successfully")
-    return StreamingResponse(audio_stream, media_type="audio/wav")
\ No newline at end of file
+    with span("encode"):
+        try:
+            import urllib.parse
+            # URL encode the text to handle special characters
+            encoded_text = urllib.parse.quote(assistant_text.replace('\n', ' ').replace('\r', ' '))
+            response.headers["X-Assistant-Text"] = encoded_text
+            logger.debug("Encoded header: %s", encoded_text)
+        except Exception as e:
+            logger.debug("Header encoding error: %s", e)
+            response.headers["X-Assistant-Text"] = urllib.parse.quote("Response generated successfully")
+
+        audio_stream = io.BytesIO(wav_bytes)
+
+    logger.debug("Request completed successfully")
+    return StreamingResponse(audio_stream, media_type="audio/wav")
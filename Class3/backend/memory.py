@@ -1,17 +1,234 @@
-from collections import deque
-from typing import Deque, Dict, List, Tuple
-
-# Simple in-memory store: session_id -> deque of (user, assistant)
-_CONV: Dict[str, Deque[Tuple[str, str]]] = {}
-
-def get_history(session_id: str, max_turns: int = 5) -> List[Tuple[str, str]]:
-    dq = _CONV.get(session_id)
-    if not dq:
-        return []
-    # Return list copy
-    return list(dq)[-max_turns:]
-
-def push_turn(session_id: str, user_text: str, assistant_text: str, max_turns: int = 5) -> None:
-    if session_id not in _CONV:
-        _CONV[session_id] = deque(maxlen=max_turns)
-    _CONV[session_id].append((user_text, assistant_text))
+"""Conversation memory: session_id -> recent (user, assistant) turns.
+
+Backends (MEMORY_BACKEND):
+  memory : in-process dict of deques, LRU-capped and idle-TTL'd (default)
+  sqlite : SQLite in WAL mode, shared by every uvicorn worker on the node
+
+Env:
+  MEMORY_BACKEND      : memory|sqlite (default: memory)
+  MEMORY_DB           : SQLite file (default: memory.db next to this file)
+  MEMORY_MAX_SESSIONS : in-process session cap, least recently used evicted first (default: 10000)
+  MEMORY_TTL_S        : forget sessions idle for longer than this (default: 3600)
+  MEMORY_MAX_TOKENS   : if set, get_history keeps only the newest turns that fit this many LLM
+                        tokens, and the turn cap below is raised so the budget decides
+  MEMORY_MAX_TURNS    : turns kept per session (default: 5, or 50 with MEMORY_MAX_TOKENS)
+
+get_history/push_turn block (SQLite I/O, and the LLM tokenizer for MEMORY_MAX_TOKENS), so
+async handlers call them through asyncio.to_thread.
+"""
+from __future__ import annotations
+
+import abc
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+Turn = Tuple[str, str]
+
+
+def default_max_turns() -> int:
+    # Read per call: the apps run load_dotenv() after importing this module.
+    default = "50" if os.getenv("MEMORY_MAX_TOKENS") else "5"
+    return int(os.getenv("MEMORY_MAX_TURNS", default))
+
+
+def _llm_tokens(text: str) -> int:
+    from llm import count_tokens  # lazy: keeps the model off memory's import path
+    return count_tokens(text)
+
+
+def trim_to_token_budget(turns: List[Turn], max_tokens: int,
+                         count_tokens: Callable[[str], int] = _llm_tokens) -> List[Turn]:
+    """Keep the newest turns whose combined size fits in ``max_tokens``."""
+    kept: List[Turn] = []
+    used = 0
+    for user_text, assistant_text in reversed(turns):
+        used += count_tokens(user_text) + count_tokens(assistant_text)
+        if used > max_tokens:
+            break
+        kept.append((user_text, assistant_text))
+    kept.reverse()
+    return kept
+
+
+class MemoryStore(abc.ABC):
+    """Interface every backend implements."""
+
+    @abc.abstractmethod
+    def get_history(self, session_id: str, max_turns: int = 5) -> List[Turn]:
+        ...
+
+    @abc.abstractmethod
+    def push_turn(self, session_id: str, user_text: str, assistant_text: str, max_turns: int = 5) -> None:
+        ...
+
+
+class InProcessMemoryStore(MemoryStore):
+    def __init__(self, max_sessions: int = 10000, ttl_s: float = 3600.0):
+        self.max_sessions = max_sessions
+        self.ttl_s = ttl_s
+        # session_id -> (turns, last access); kept in LRU order
+        self._conv: "OrderedDict[str, Tuple[Deque[Turn], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        # caller holds the lock; oldest sessions are at the front
+        while self._conv:
+            session_id, (_, last) = next(iter(self._conv.items()))
+            if now - last <= self.ttl_s:
+                break
+            del self._conv[session_id]
+
+    def get_history(self, session_id: str, max_turns: int = 5) -> List[Turn]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._conv.get(session_id)
+            if not entry:
+                return []
+            self._conv[session_id] = (entry[0], now)
+            self._conv.move_to_end(session_id)
+            # Return list copy ([-0:] would be everything)
+            return list(entry[0])[-max_turns:] if max_turns > 0 else []
+
+    def push_turn(self, session_id: str, user_text: str, assistant_text: str, max_turns: int = 5) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._conv.pop(session_id, None)
+            dq = entry[0] if entry else deque(maxlen=max_turns)
+            dq.append((user_text, assistant_text))
+            self._conv[session_id] = (dq, now)
+            while len(self._conv) > self.max_sessions:
+                self._conv.popitem(last=False)
+
+
+class SQLiteMemoryStore(MemoryStore):
+    """Turns plus a per-session last-access time; like the in-process store, the TTL applies
+    to whole idle sessions (reads count as access), not to individual turns.
+
+    Reads don't take the write lock: get_history refreshes the access time with a separate
+    conditional UPDATE, at most once per ``touch_s`` per session.
+    """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS turns (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        user_text TEXT NOT NULL,
+        assistant_text TEXT NOT NULL,
+        ts REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS turns_session ON turns(session_id, id);
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        last REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS sessions_last ON sessions(last);
+    """
+    _EXPIRE_EVERY = 256  # pushes between TTL sweeps
+
+    def __init__(self, path: str, ttl_s: float = 3600.0):
+        self.path = path
+        self.ttl_s = ttl_s
+        self._local = threading.local()
+        self._pushes = 0
+        self.touch_s = min(60.0, ttl_s / 10)
+        conn = self._conn()
+        conn.executescript(self._SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections are not shareable across threads; one per worker thread.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")    # readers don't block the writer across processes
+            conn.execute("PRAGMA synchronous=NORMAL")  # safe with WAL, avoids an fsync per turn
+            self._local.conn = conn
+        return conn
+
+    def _touch(self, conn: sqlite3.Connection, session_id: str, now: float) -> None:
+        """Mark the session accessed, dropping its turns first if it had gone idle."""
+        row = conn.execute("SELECT last FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is not None and now - row[0] > self.ttl_s:
+            conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+        conn.execute("INSERT OR REPLACE INTO sessions (session_id, last) VALUES (?, ?)", (session_id, now))
+
+    def get_history(self, session_id: str, max_turns: int = 5) -> List[Turn]:
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute("SELECT last FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None or now - row[0] > self.ttl_s:
+            return []  # idle: the next push_turn or TTL sweep deletes its turns
+        rows = conn.execute(
+            "SELECT user_text, assistant_text FROM turns WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, max_turns),
+        ).fetchall()
+        if now - row[0] > self.touch_s:
+            conn.execute("UPDATE sessions SET last = ? WHERE session_id = ? AND last < ?", (now, session_id, now))
+        return [(u, a) for u, a in reversed(rows)]
+
+    def push_turn(self, session_id: str, user_text: str, assistant_text: str, max_turns: int = 5) -> None:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._touch(conn, session_id, now)
+            conn.execute(
+                "INSERT INTO turns (session_id, user_text, assistant_text, ts) VALUES (?, ?, ?, ?)",
+                (session_id, user_text, assistant_text, now),
+            )
+            conn.execute(
+                "DELETE FROM turns WHERE session_id = ? AND id NOT IN "
+                "(SELECT id FROM turns WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, max_turns),
+            )
+            self._pushes += 1
+            if self._pushes % self._EXPIRE_EVERY == 0:
+                cutoff = now - self.ttl_s
+                conn.execute("DELETE FROM turns WHERE session_id IN "
+                             "(SELECT session_id FROM sessions WHERE last < ?)", (cutoff,))
+                conn.execute("DELETE FROM sessions WHERE last < ?", (cutoff,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+_STORE: Optional[MemoryStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_store() -> MemoryStore:
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                ttl_s = float(os.getenv("MEMORY_TTL_S", "3600"))
+                backend = os.getenv("MEMORY_BACKEND", "memory").lower()
+                if backend == "sqlite":
+                    path = os.getenv("MEMORY_DB") or os.path.join(os.path.dirname(__file__), "memory.db")
+                    _STORE = SQLiteMemoryStore(path, ttl_s=ttl_s)
+                elif backend == "memory":
+                    _STORE = InProcessMemoryStore(int(os.getenv("MEMORY_MAX_SESSIONS", "10000")), ttl_s=ttl_s)
+                else:
+                    raise ValueError(f"MEMORY_BACKEND must be memory or sqlite, got {backend!r}")
+    return _STORE
+
+
+def get_history(session_id: str, max_turns: Optional[int] = None, max_tokens: Optional[int] = None,
+                count_tokens: Callable[[str], int] = _llm_tokens) -> List[Turn]:
+    history = get_store().get_history(session_id, max_turns=default_max_turns() if max_turns is None else max_turns)
+    if max_tokens is None and os.getenv("MEMORY_MAX_TOKENS"):
+        max_tokens = int(os.getenv("MEMORY_MAX_TOKENS"))
+    if max_tokens is not None:
+        history = trim_to_token_budget(history, max_tokens, count_tokens)
+    return history
+
+
+def push_turn(session_id: str, user_text: str, assistant_text: str, max_turns: Optional[int] = None) -> None:
+    get_store().push_turn(session_id, user_text, assistant_text,
+                         max_turns=default_max_turns() if max_turns is None else max_turns)
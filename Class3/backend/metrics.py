@@ -0,0 +1,190 @@
+"""Per-stage latency spans, request ids, Prometheus metrics and an opt-in sampling profiler.
+
+- ``span("asr")`` times a block into the ``voice_stage_seconds{stage=...}`` histogram and,
+  when DEBUG logging is on, logs one structured line tagged with the current request id.
+- ``RequestContextMiddleware`` assigns the request id (``X-Request-ID`` header or a new
+  uuid4), echoes it back, and optionally profiles the request.
+- ``GET /metrics`` (ops.py) exports histograms plus in-flight, worker-queue, model-load and
+  TTS-cache gauges in the Prometheus text format.
+
+Env:
+  PROFILE_ENABLED     : 1 to honour the ``X-Profile: 1`` request header (default: 0)
+  PROFILE_INTERVAL_MS : stack sampling interval (default: 5)
+  PROFILE_DIR         : where collapsed-stack profiles are written (default: ./profiles)
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+
+from prometheus_client import Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+
+logger = logging.getLogger("voice.metrics")
+
+_REQUEST_ID: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+
+STAGE_SECONDS = Histogram(
+    "voice_stage_seconds",
+    "Latency of each /chat pipeline stage",
+    labelnames=["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+QUEUE_SECONDS = Histogram(
+    "voice_worker_queue_seconds",
+    "Time a stage job waited for a free worker",
+    labelnames=["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30),
+)
+WORKER_QUEUE_DEPTH = Gauge("voice_worker_queue_depth", "Stage jobs submitted but not finished", ["stage"])
+MODEL_LOAD_SECONDS = Gauge("voice_model_load_seconds", "Cold-start time per stage and phase", ["stage", "phase"])
+MODEL_LOADED = Gauge("voice_model_loaded", "1 once the stage's model is loaded and warmed", ["stage"])
+
+
+def request_id() -> str:
+    return _REQUEST_ID.get()
+
+
+def observe(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+@contextlib.contextmanager
+def span(stage: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        STAGE_SECONDS.labels(stage).observe(dt)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({"request_id": _REQUEST_ID.get(), "stage": stage, "ms": round(dt * 1000, 3)}))
+
+
+class _StateCollector:
+    """Gauges computed at scrape time from module state (no bookkeeping on the hot path)."""
+
+    def describe(self):
+        # Lets REGISTRY.register skip an eager collect() (workers imports this module).
+        yield GaugeMetricFamily("voice_inflight_requests", "Requests currently admitted")
+        yield GaugeMetricFamily("voice_tts_cache", "TTS cache counters and size", labels=["field"])
+
+    def collect(self):
+        import tts_cache
+        import workers
+
+        inflight = GaugeMetricFamily("voice_inflight_requests", "Requests currently admitted")
+        inflight.add_metric([], workers.inflight())
+        yield inflight
+        cache = GaugeMetricFamily("voice_tts_cache", "TTS cache counters and size", labels=["field"])
+        for field, value in tts_cache.stats().items():
+            cache.add_metric([field], value)
+        yield cache
+
+
+REGISTRY.register(_StateCollector())
+
+
+class _Sampler(threading.Thread):
+    """Samples every thread's Python stack at a fixed interval; writes collapsed stacks.
+
+    The output (``thread;outer;...;inner count`` per line) loads directly into flamegraph
+    tools. All threads are sampled, so concurrent requests show up too.
+    """
+
+    def __init__(self, path: str, interval_s: float):
+        super().__init__(name="profiler", daemon=True)
+        self.path = path
+        self.interval_s = interval_s
+        self.stacks: Counter = Counter()
+        self._halt = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._halt.wait(self.interval_s):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._halt.set()
+        self.join()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+_UNSAFE_ID = re.compile(r"[^A-Za-z0-9_-]+")
+_MAX_ID_LEN = 64
+
+
+class RequestContextMiddleware:
+    """Pure ASGI middleware (no per-request task/queue overhead like BaseHTTPMiddleware).
+
+    An ``X-Profile: 1`` request samples the whole process while it runs: every thread's
+    stack is recorded, so overlapping requests and background work land in the same
+    profile. Profile under isolated load to attribute samples to one request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope.get("headers") or [])
+        # Client-supplied ids end up in log lines, a response header and the profile file
+        # name, so keep only [A-Za-z0-9_-] (no path separators or dots) and cap the length.
+        rid = _UNSAFE_ID.sub("", headers.get(b"x-request-id", b"").decode("latin-1"))[:_MAX_ID_LEN]
+        rid = rid or uuid.uuid4().hex
+        token = _REQUEST_ID.set(rid)
+
+        sampler: Optional[_Sampler] = None
+        if os.getenv("PROFILE_ENABLED", "0") == "1" and headers.get(b"x-profile") == b"1":
+            path = os.path.join(os.getenv("PROFILE_DIR", "profiles"), f"{rid}.collapsed")
+            sampler = _Sampler(path, float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000.0)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                extra = [(b"x-request-id", rid.encode("latin-1"))]
+                if sampler is not None:
+                    extra.append((b"x-profile-file", sampler.path.encode("latin-1")))
+                message["headers"] = list(message.get("headers", [])) + extra
+            await send(message)
+
+        if sampler is not None:
+            sampler.start()
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            try:
+                if sampler is not None:
+                    await asyncio.to_thread(sampler.stop)  # joins the sampler and writes the file
+            finally:
+                _REQUEST_ID.reset(token)
+
+
+def install(app) -> None:
+    app.add_middleware(RequestContextMiddleware)
@@ -0,0 +1,36 @@
+"""Operational endpoints shared by every app variant."""
+from __future__ import annotations
+
+from fastapi import APIRouter, Response
+from fastapi.responses import JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+import audio_capture
+import response_cache
+import tts_cache
+import warmup
+import workers
+
+router = APIRouter()
+
+
+@router.get("/stats")
+def stats():
+    return {
+        "inflight": workers.inflight(),
+        "tts_cache": tts_cache.stats(),
+        "audio_capture": audio_capture.stats(),
+        "response_cache": response_cache.stats(),
+    }
+
+
+@router.get("/ready")
+def ready():
+    """200 once every stage is loaded and warmed, 503 before that (or if a stage failed)."""
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@router.get("/metrics")
+def prometheus_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,218 @@
+"""Opt-in cache of whole replies (text + WAV) for repeated questions.
+
+A question hits when its normalized text matches a cached one exactly, or when its
+sentence embedding (a small local model, mean-pooled and L2-normalized) has cosine
+similarity >= RESPONSE_CACHE_THRESHOLD with a cached question. A hit skips both the LLM
+and TTS. Entries expire after RESPONSE_CACHE_TTL_S; the index is a numpy matrix searched
+with one matrix-vector product.
+
+Replies depend on the conversation, so the cache is bypassed (no lookup, no store) when
+the session has history the question may refer to: a referring word ("it", "that", ...)
+or an embedding similar to the previous turn.
+
+Env:
+  RESPONSE_CACHE             : 1 to enable (default: 0)
+  RESPONSE_CACHE_MODEL       : HF encoder for embeddings (default: sentence-transformers/all-MiniLM-L6-v2)
+  RESPONSE_CACHE_THRESHOLD   : min cosine similarity for a semantic hit (default: 0.92)
+  RESPONSE_CACHE_TTL_S       : entry lifetime (default: 3600)
+  RESPONSE_CACHE_MAX         : max entries, oldest evicted first (default: 2000)
+  RESPONSE_CACHE_HISTORY_SIM : similarity to the last turn that counts as a follow-up (default: 0.6)
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+Turn = Tuple[str, str]
+
+_REFERRING = frozenset(
+    "it its that this these those they them their he him his she her again more else too also".split()
+)
+_PUNCT = re.compile(r"[^\w\s']+")
+
+_tokenizer = None
+_model = None
+_INIT_LOCK = threading.Lock()
+
+
+def enabled() -> bool:
+    return os.getenv("RESPONSE_CACHE", "0") == "1"
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(_PUNCT.sub(" ", text).split())
+
+
+def _init_model():
+    global _tokenizer, _model
+    if _model is None:
+        with _INIT_LOCK:
+            if _model is None:
+                from transformers import AutoModel, AutoTokenizer
+                name = os.getenv("RESPONSE_CACHE_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+                _tokenizer = AutoTokenizer.from_pretrained(name)
+                model = AutoModel.from_pretrained(name)
+                model.eval()
+                _model = model
+    return _tokenizer, _model
+
+
+@functools.lru_cache(maxsize=256)
+def _embed(normalized: str) -> np.ndarray:
+    """Mean-pooled, L2-normalized sentence embedding (memoized: get and put share it)."""
+    import torch
+
+    tokenizer, model = _init_model()
+    inputs = tokenizer([normalized], return_tensors="pt", truncation=True, max_length=128)
+    with torch.no_grad():
+        hidden = model(**inputs).last_hidden_state
+    mask = inputs.attention_mask.unsqueeze(-1).to(hidden.dtype)
+    vec = ((hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9))[0].float().numpy()
+    return vec / (np.linalg.norm(vec) + 1e-12)
+
+
+class ResponseCache:
+    def __init__(self, threshold: float, ttl_s: float, max_entries: int):
+        self.threshold = threshold
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        # normalized question -> (assistant_text, wav, embedding, created); oldest first
+        self._entries: "OrderedDict[str, Tuple[str, bytes, np.ndarray, float]]" = OrderedDict()
+        self._keys: List[str] = []
+        self._matrix: Optional[np.ndarray] = None  # rebuilt lazily after inserts/evictions
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "bypassed": 0}
+
+    def _expire(self, now: float) -> None:
+        # caller holds the lock
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry[3] <= self.ttl_s and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+            self._matrix = None
+
+    def _index(self) -> Optional[np.ndarray]:
+        # caller holds the lock
+        if self._matrix is None and self._entries:
+            self._keys = list(self._entries)
+            self._matrix = np.stack([entry[2] for entry in self._entries.values()])
+        return self._matrix
+
+    def get(self, question: str) -> Optional[Tuple[str, bytes]]:
+        key = normalize(question)
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._stats["hits"] += 1
+                return entry[0], entry[1]
+            if not self._entries:
+                self._stats["misses"] += 1
+                return None
+        vec = _embed(key)
+        with self._lock:
+            matrix = self._index()
+            if matrix is not None:
+                scores = matrix @ vec
+                best = int(scores.argmax())
+                if scores[best] >= self.threshold:
+                    entry = self._entries[self._keys[best]]
+                    self._stats["hits"] += 1
+                    self._stats["semantic_hits"] += 1
+                    return entry[0], entry[1]
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, question: str, assistant_text: str, wav: bytes) -> None:
+        key = normalize(question)
+        vec = _embed(key)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (assistant_text, wav, vec, time.monotonic())
+            self._matrix = None
+            self._expire(time.monotonic())
+
+    def bypassed(self) -> None:
+        with self._lock:
+            self._stats["bypassed"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+
+def depends_on_history(question: str, history: List[Turn]) -> bool:
+    """Whether the question may refer to earlier turns, so a cached answer could be wrong."""
+    if not history:
+        return False
+    key = normalize(question)
+    if _REFERRING.intersection(key.split()):
+        return True
+    last_user, last_assistant = history[-1]
+    vec = _embed(key)
+    sims = [float(vec @ _embed(normalize(text))) for text in (last_user, last_assistant) if text]
+    return max(sims, default=0.0) >= float(os.getenv("RESPONSE_CACHE_HISTORY_SIM", "0.6"))
+
+
+_CACHE: Optional[ResponseCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache() -> Optional[ResponseCache]:
+    global _CACHE
+    if not enabled():
+        return None
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = ResponseCache(
+                    threshold=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.92")),
+                    ttl_s=float(os.getenv("RESPONSE_CACHE_TTL_S", "3600")),
+                    max_entries=int(os.getenv("RESPONSE_CACHE_MAX", "2000")),
+                )
+    return _CACHE
+
+
+def lookup(question: str, history: List[Turn]) -> Optional[Tuple[str, bytes]]:
+    """(assistant_text, wav) for a cached answer, or None (miss, disabled or bypassed)."""
+    cache = get_cache()
+    if cache is None:
+        return None
+    if depends_on_history(question, history):
+        cache.bypassed()
+        return None
+    return cache.get(question)
+
+
+def store(question: str, history: List[Turn], assistant_text: str, wav: bytes) -> None:
+    cache = get_cache()
+    if cache is not None and not depends_on_history(question, history):
+        cache.put(question, assistant_text, wav)
+
+
+async def alookup(question: str, history: List[Turn]) -> Optional[Tuple[str, bytes]]:
+    """lookup() off the event loop (embedding is a model call); free when disabled."""
+    if not enabled():
+        return None
+    return await asyncio.to_thread(lookup, question, history)
+
+
+async def astore(question: str, history: List[Turn], assistant_text: str, wav: bytes) -> None:
+    if enabled():
+        await asyncio.to_thread(store, question, history, assistant_text, wav)
+
+
+def stats() -> Dict[str, int]:
+    cache = get_cache()
+    return cache.stats() if cache is not None else {}
@@ -0,0 +1,124 @@
+"""POST /chat/stream: sentence-chunked audio for a low time-to-first-audio.
+
+The LLM reply is generated token by token; each completed sentence is handed to TTS
+right away and its WAV is written to the chunked HTTP response as soon as it is ready,
+while the LLM keeps generating the next sentence. Segments are WAV unless the Accept
+header asks for another codec (see framing.accepted_codec).
+
+Response body (``application/x-voice-frames``, see framing.py), in order:
+  {"type": "user_text", "text": ...}
+  {"type": "audio", "index": i, "text": sentence, "format": ..., ...} + audio bytes   (repeated)
+  {"type": "end", "text": full_reply}
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import deque
+from typing import AsyncIterator, Optional, Tuple
+
+from fastapi import APIRouter, File, Form, Header, UploadFile
+from fastapi.responses import StreamingResponse
+
+import audio_codec
+from asr import transcribe_audio
+from framing import MEDIA_TYPE, accepted_codec, encode_frame
+from llm import stream_sentences
+from memory import get_history, push_turn
+from tts import tts_to_wav_bytes
+import workers
+from workers import iterate_stage, run_stage
+
+router = APIRouter()
+
+
+def _synthesize(sentence: str, codec: str):
+    return audio_codec.encode(tts_to_wav_bytes(sentence), codec)
+
+
+async def speak(user_text: str, history, codec: str = "wav",
+                session_id: Optional[str] = None) -> AsyncIterator[Tuple[int, str, bytes, dict]]:
+    """Yield (index, sentence, audio, audio_info) in order as the reply is generated.
+
+    Synthesis of sentence i overlaps generation of sentence i+1. If the consumer stops
+    early (client gone), LLM generation is stopped and queued TTS work is cancelled.
+    """
+    index = 0
+    pending: deque = deque()
+    stop = threading.Event()
+    sentences = iterate_stage("llm", stream_sentences, user_text, history, session_id=session_id, stop=stop)
+    try:
+        async for sentence in sentences:
+            pending.append((index, sentence, asyncio.ensure_future(run_stage("tts", _synthesize, sentence, codec))))
+            index += 1
+            while pending and pending[0][2].done():
+                i, said, task = pending.popleft()
+                yield (i, said, *task.result())
+        while pending:
+            i, said, task = pending.popleft()
+            yield (i, said, *(await task))
+    finally:
+        stop.set()
+        for _, _, task in pending:
+            task.cancel()
+        await sentences.aclose()
+
+
+class _ReservedStreamingResponse(StreamingResponse):
+    """Releases the request's slot however the response ends, even if the body never ran."""
+
+    def __init__(self, content, reservation: workers.Reservation, **kwargs):
+        super().__init__(content, **kwargs)
+        self.reservation = reservation
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.reservation.release()
+
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(
+    file: UploadFile = File(None),
+    text: Optional[str] = Form(None),
+    x_session_id: Optional[str] = Header(default="default"),
+    accept: Optional[str] = Header(default=None),
+):
+    # A yield dependency would release its slot before the body below runs, so the slot is
+    # reserved here, before the first await, and released when the stream ends.
+    reservation = workers.reserve()
+    try:
+        audio_bytes = await file.read() if file is not None and not (text and text.strip()) else None
+        codec = accepted_codec(accept) or "wav"
+    except BaseException:
+        reservation.release()
+        raise
+
+    async def frames():
+        try:
+            # 1) ASR (or text override)
+            if text and text.strip():
+                user_text = text.strip()
+            elif audio_bytes is None:
+                user_text = "(no audio, no text)"
+            else:
+                user_text = await run_stage("asr", transcribe_audio, audio_bytes)
+            yield encode_frame({"type": "user_text", "text": user_text})
+
+            # 2) Memory
+            history = await asyncio.to_thread(get_history, x_session_id)
+
+            # 3) LLM -> 4) TTS, pipelined
+            sentences = []
+            async for index, sentence, audio, info in speak(user_text, history, codec, session_id=x_session_id):
+                sentences.append(sentence)
+                yield encode_frame({"type": "audio", "index": index, "text": sentence, **info}, audio)
+
+            assistant_text = " ".join(sentences)
+            await asyncio.to_thread(push_turn, x_session_id, user_text, assistant_text)
+            yield encode_frame({"type": "end", "text": assistant_text})
+        finally:
+            reservation.release()
+
+    return _ReservedStreamingResponse(frames(), reservation, media_type=MEDIA_TYPE)
@@ -1,15 +1,163 @@
+"""TTS with a long-lived pyttsx3 engine.
+
+One background thread owns the engine and serves a queue of synthesis jobs, so each
+reply no longer pays ``pyttsx3.init()`` plus a temp-dir and ffmpeg decode/re-encode.
+pyttsx3 can only synthesize to a file, so the scratch file goes to tmpfs (/dev/shm)
+when available and the WAV is parsed with the stdlib ``wave`` module. pydub/ffmpeg is
+only used as a fallback when a driver writes something other than RIFF/WAV
+(e.g. AIFF from macOS NSSpeechSynthesizer).
+
+Env:
+  TTS_VOICE  : pyttsx3 voice id (default: engine default)
+  TTS_RATE   : speaking rate in words per minute (default: engine default)
+  TTS_TMPDIR : scratch directory (default: /dev/shm if present, else the system temp dir)
+"""
+from __future__ import annotations
+
 import io
-import pyttsx3
-from pydub import AudioSegment
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+import wave
+from concurrent.futures import Future
+from typing import Dict, NamedTuple, Optional
 
-def tts_to_wav_bytes(text: str) -> bytes:
-    engine = pyttsx3.init()
-    import tempfile, os
-    with tempfile.TemporaryDirectory() as td:
-        out_path = os.path.join(td, "out.wav")
-        engine.save_to_file(text, out_path)
-        engine.runAndWait()
-        seg = AudioSegment.from_file(out_path)
+import tts_cache
+from metrics import span
+
+
+class PCMAudio(NamedTuple):
+    pcm: bytes
+    sample_rate: int
+    channels: int
+    sample_width: int  # bytes per sample
+
+    def to_wav(self) -> bytes:
         buf = io.BytesIO()
-        seg.export(buf, format="wav")
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(self.channels)
+            w.setsampwidth(self.sample_width)
+            w.setframerate(self.sample_rate)
+            w.writeframes(self.pcm)
         return buf.getvalue()
+
+
+def _scratch_dir() -> str:
+    configured = os.getenv("TTS_TMPDIR")
+    if configured:
+        return configured
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+def _read_audio_file(path: str) -> PCMAudio:
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        with wave.open(io.BytesIO(data), "rb") as w:
+            return PCMAudio(w.readframes(w.getnframes()), w.getframerate(), w.getnchannels(), w.getsampwidth())
+    from pydub import AudioSegment  # non-WAV driver output only
+    seg = AudioSegment.from_file(io.BytesIO(data))
+    return PCMAudio(seg.raw_data, seg.frame_rate, seg.channels, seg.sample_width)
+
+
+class _TTSWorker(threading.Thread):
+    """Owns the pyttsx3 engine; all engine calls happen on this thread."""
+
+    def __init__(self):
+        super().__init__(name="tts-engine", daemon=True)
+        self.jobs: "queue.Queue[tuple[str, Future]]" = queue.Queue()
+        self.scratch = _scratch_dir()
+
+    def _init_engine(self):
+        import pyttsx3
+
+        engine = pyttsx3.init()
+        voice = os.getenv("TTS_VOICE")
+        if voice:
+            engine.setProperty("voice", voice)
+        rate = os.getenv("TTS_RATE")
+        if rate:
+            engine.setProperty("rate", int(rate))
+        return engine
+
+    def _synthesize(self, engine, text: str) -> PCMAudio:
+        out_path = os.path.join(self.scratch, f"tts-{uuid.uuid4().hex}.wav")
+        try:
+            engine.save_to_file(text, out_path)
+            engine.runAndWait()
+            return _read_audio_file(out_path)
+        finally:
+            try:
+                os.remove(out_path)
+            except OSError:
+                pass
+
+    def run(self):
+        try:
+            engine = self._init_engine()
+            init_error: Optional[BaseException] = None
+        except BaseException as e:
+            engine, init_error = None, e
+        while True:
+            text, fut = self.jobs.get()
+            if not fut.set_running_or_notify_cancel():
+                continue
+            if init_error is not None:
+                fut.set_exception(init_error)
+                continue
+            try:
+                fut.set_result(self._synthesize(engine, text))
+            except BaseException as e:
+                fut.set_exception(e)
+
+    def submit(self, text: str) -> Future:
+        fut: Future = Future()
+        self.jobs.put((text, fut))
+        return fut
+
+
+_WORKER: Optional[_TTSWorker] = None
+_WORKER_LOCK = threading.Lock()
+
+
+def _get_worker() -> _TTSWorker:
+    global _WORKER
+    if _WORKER is None:
+        with _WORKER_LOCK:
+            if _WORKER is None:
+                worker = _TTSWorker()
+                worker.start()
+                _WORKER = worker
+    return _WORKER
+
+
+def tts_to_pcm(text: str) -> PCMAudio:
+    """Synthesize ``text`` and return raw PCM plus its format."""
+    return _get_worker().submit(text).result()
+
+
+def tts_to_wav_bytes(text: str) -> bytes:
+    with span("tts"):
+        cache = tts_cache.get_cache()
+        if cache is None:
+            return tts_to_pcm(text).to_wav()
+        key = tts_cache.cache_key(text, os.getenv("TTS_VOICE", ""), os.getenv("TTS_RATE", ""))
+        wav = cache.get(key)
+        if wav is None:
+            wav = tts_to_pcm(text).to_wav()
+            cache.put(key, wav)
+        return wav
+
+
+def warmup() -> Dict[str, float]:
+    """Start the engine thread and synthesize one short phrase (not cached)."""
+    t0 = time.perf_counter()
+    worker = _get_worker()
+    t1 = time.perf_counter()
+    worker.submit("Ready.").result()
+    return {"load": t1 - t0, "warm": time.perf_counter() - t1}
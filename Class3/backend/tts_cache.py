@@ -0,0 +1,153 @@
+"""Content-addressed cache for synthesized speech.
+
+Keys are sha256(normalized text, voice, rate). Two tiers:
+  - memory: LRU bounded by total bytes
+  - disk (optional): one WAV file per key, survives restarts, bounded by total bytes
+
+Env:
+  TTS_CACHE_MB      : memory tier budget in MB, 0 disables the cache (default: 32)
+  TTS_CACHE_DIR     : directory for the disk tier (default: unset = memory only)
+  TTS_CACHE_DISK_MB : disk tier budget in MB (default: 512)
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional
+
+_PRUNE_EVERY = 64  # disk writes between directory scans
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(text: str, voice: str, rate: str) -> str:
+    raw = "\x1f".join((normalize_text(text), voice, rate))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None, disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._lru: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.wav")
+
+    def _put_memory(self, key: str, value: bytes) -> None:
+        # caller holds the lock
+        if len(value) > self.max_bytes:
+            return
+        old = self._lru.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._lru[key] = value
+        self._bytes += len(value)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._lru.popitem(last=False)
+            self._bytes -= len(evicted)
+            self._stats["evictions"] += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._lru.get(key)
+            if value is not None:
+                self._lru.move_to_end(key)
+                self._stats["hits"] += 1
+                return value
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, "rb") as f:
+                    value = f.read()
+                os.utime(path)  # mark as recently used for _prune_disk (atime is often noatime/relatime)
+            except OSError:
+                value = None
+            if value is not None:
+                with self._lock:
+                    self._stats["disk_hits"] += 1
+                    self._put_memory(key, value)
+                return value
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._put_memory(key, value)
+            self._disk_writes += 1
+            prune = self._disk_writes % _PRUNE_EVERY == 0
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp, "wb") as f:
+                    f.write(value)
+                os.replace(tmp, path)  # atomic: readers never see a partial file
+            except OSError:
+                return
+            if prune:
+                self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        entries = []
+        total = 0
+        with os.scandir(self.disk_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".wav"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+        entries.sort()  # least recently written or hit first
+        for _, size, path in entries:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self._stats["disk_evictions"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, entries=len(self._lru), bytes=self._bytes, max_bytes=self.max_bytes)
+
+
+_CACHE: Optional[TTSCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache() -> Optional[TTSCache]:
+    """Process-wide cache configured from the environment, or None when disabled."""
+    global _CACHE
+    max_mb = float(os.getenv("TTS_CACHE_MB", "32"))
+    if max_mb <= 0:
+        return None
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = TTSCache(
+                    max_bytes=int(max_mb * 1024 * 1024),
+                    disk_dir=os.getenv("TTS_CACHE_DIR") or None,
+                    disk_max_bytes=int(float(os.getenv("TTS_CACHE_DISK_MB", "512")) * 1024 * 1024),
+                )
+    return _CACHE
+
+
+def stats() -> Dict[str, int]:
+    cache = get_cache()
+    return cache.stats() if cache is not None else {}
@@ -0,0 +1,95 @@
+"""Startup: preload and warm ASR, LLM and TTS in parallel, and track readiness.
+
+``lifespan`` starts the warm-up in the background so the server accepts connections
+immediately; ``GET /ready`` (ops.py) answers 503 until every stage is loaded and has run
+one inference, then 200 with the per-stage cold-start breakdown.
+
+Env:
+  WARMUP : 1 to preload all stages at startup (default: 1)
+
+CLI:
+  python warmup.py                              # print the cold-start breakdown
+  python warmup.py --save-llm-artifact llm.pt   # serialize the LLM for LLM_ARTIFACT
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+import asr
+import llm
+import metrics
+import tts
+import workers
+
+_STAGES = {"asr": asr.warmup, "llm": llm.warmup, "tts": tts.warmup}
+
+_STATUS: Dict[str, object] = {"ready": False, "stages": {}, "errors": {}, "total": None}
+
+
+def status() -> Dict[str, object]:
+    return dict(_STATUS)
+
+
+def warm_all() -> Dict[str, object]:
+    """Warm every stage concurrently; record per-stage load/warm seconds and any failure."""
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(_STAGES), thread_name_prefix="warmup") as pool:
+        futures = {name: pool.submit(fn) for name, fn in _STAGES.items()}
+        for name, fut in futures.items():
+            try:
+                _STATUS["stages"][name] = timing = fut.result()
+            except Exception as e:
+                _STATUS["errors"][name] = repr(e)
+                continue
+            for phase, seconds in timing.items():
+                metrics.MODEL_LOAD_SECONDS.labels(name, phase).set(seconds)
+            metrics.MODEL_LOADED.labels(name).set(1)
+    _STATUS["total"] = time.perf_counter() - t0
+    _STATUS["ready"] = not _STATUS["errors"]
+    return status()
+
+
+def _report(result: Dict[str, object]) -> None:
+    for name, timing in result["stages"].items():
+        print(f"[STARTUP] {name:<4} load={timing['load']:6.2f}s warm={timing['warm']:6.2f}s")
+    for name, err in result["errors"].items():
+        print(f"[STARTUP] {name:<4} FAILED: {err}")
+    print(f"[STARTUP] total {result['total']:.2f}s, ready={result['ready']}")
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    task = None
+    if os.getenv("WARMUP", "1") == "1":
+        async def _warm():
+            _report(await asyncio.to_thread(warm_all))
+        task = asyncio.create_task(_warm())
+    else:
+        _STATUS["ready"] = True
+    yield
+    if task is not None and not task.done():
+        task.cancel()
+    workers.shutdown()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--save-llm-artifact", metavar="PATH", default=None)
+    args = ap.parse_args()
+    from dotenv import load_dotenv
+    load_dotenv()
+    if args.save_llm_artifact:
+        llm.save_artifact(args.save_llm_artifact)
+        print(f"saved {args.save_llm_artifact}; set LLM_ARTIFACT={args.save_llm_artifact}")
+        return
+    _report(warm_all())
+
+
+if __name__ == "__main__":
+    main()
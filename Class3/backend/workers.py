@@ -0,0 +1,201 @@
+"""Per-stage worker pools and admission control for the /chat pipeline.
+
+ASR, LLM and TTS are blocking calls; running them directly inside an ``async def``
+handler freezes the uvicorn event loop for every other client. Each stage gets its
+own executor so one session's TTS can overlap another session's ASR, and a global
+in-flight limit turns overload into a fast 503 instead of an unbounded backlog.
+
+Env:
+  ASR_WORKERS / LLM_WORKERS / TTS_WORKERS    : pool size per stage (default: 1, or the
+                                               batch size when that stage batches)
+  ASR_EXECUTOR / LLM_EXECUTOR / TTS_EXECUTOR : thread|process (default: thread)
+  MAX_INFLIGHT : max concurrent /chat requests before returning 503 (default: 8)
+  RETRY_AFTER  : seconds advertised in the Retry-After header (default: 2)
+
+With ``process`` executors every worker process loads its own copy of the model.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator
+
+from fastapi import HTTPException
+
+import metrics
+
+STAGES = ("asr", "llm", "tts")
+
+_POOLS: Dict[str, Executor] = {}
+_inflight = 0
+
+
+def _default_workers(stage: str) -> str:
+    # A batching stage only batches what is submitted concurrently, so give it enough threads.
+    if stage == "asr" and os.getenv("ASR_BATCH", "0") == "1":
+        return os.getenv("ASR_BATCH_MAX", "8")
+    if stage == "llm" and os.getenv("LLM_BATCHING", "0") == "1":
+        return os.getenv("LLM_MAX_BATCH", "8")
+    return "1"
+
+
+def _make_pool(stage: str) -> Executor:
+    prefix = stage.upper()
+    workers = int(os.getenv(f"{prefix}_WORKERS", _default_workers(stage)))
+    kind = os.getenv(f"{prefix}_EXECUTOR", "thread").lower()
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{stage}-worker")
+
+
+def get_pool(stage: str) -> Executor:
+    if stage not in STAGES:
+        raise ValueError(f"unknown stage: {stage}")
+    pool = _POOLS.get(stage)
+    if pool is None:
+        pool = _POOLS[stage] = _make_pool(stage)
+    return pool
+
+
+async def run_stage(stage: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking ``fn(*args, **kwargs)`` on the stage's pool and await the result."""
+    loop = asyncio.get_running_loop()
+    pool = get_pool(stage)
+    call = functools.partial(fn, *args, **kwargs)
+    if isinstance(pool, ProcessPoolExecutor):
+        return await loop.run_in_executor(pool, call)
+
+    # Carry the request id (and other contextvars) into the worker thread.
+    ctx = contextvars.copy_context()
+    submitted = time.perf_counter()
+
+    def run():
+        metrics.QUEUE_SECONDS.labels(stage).observe(time.perf_counter() - submitted)
+        return ctx.run(call)
+
+    depth = metrics.WORKER_QUEUE_DEPTH.labels(stage)
+    depth.inc()
+    try:
+        return await loop.run_in_executor(pool, run)
+    finally:
+        depth.dec()
+
+
+async def iterate_stage(stage: str, gen_fn: Callable[..., Iterator[Any]], *args, **kwargs) -> AsyncIterator[Any]:
+    """Drive a blocking generator on the stage's pool and yield its items as they appear.
+
+    Generators cannot cross a process boundary, so a ``process`` stage falls back to the
+    loop's default thread pool here. If the consumer goes away (closed or cancelled, e.g.
+    the client disconnected), the generator is closed at its next item instead of being
+    driven to completion.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+    closed = threading.Event()
+
+    def put(item) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:  # loop already closed (shutdown)
+            pass
+
+    def pump():
+        gen = gen_fn(*args, **kwargs)
+        try:
+            for item in gen:
+                if closed.is_set():
+                    break
+                put(item)
+        finally:
+            gen.close()  # runs the generator's cleanup in this thread
+            put(done)
+
+    pool = get_pool(stage)
+    ctx = contextvars.copy_context()
+    fut = loop.run_in_executor(None if isinstance(pool, ProcessPoolExecutor) else pool, ctx.run, pump)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            yield item
+        await fut  # re-raises any error from the generator
+    finally:
+        closed.set()
+
+
+def inflight() -> int:
+    return _inflight
+
+
+def has_capacity() -> bool:
+    # Read per call: the apps run load_dotenv() after importing this module.
+    return _inflight < int(os.getenv("MAX_INFLIGHT", "8"))
+
+
+@contextlib.contextmanager
+def slot():
+    """Count the enclosed work as one in-flight request (callers check has_capacity first)."""
+    global _inflight
+    _inflight += 1
+    try:
+        yield
+    finally:
+        _inflight -= 1
+
+
+class Reservation:
+    """One in-flight slot, taken on construction; release() is idempotent."""
+
+    def __init__(self):
+        global _inflight
+        _inflight += 1
+        self._held = True
+
+    def release(self) -> None:
+        global _inflight
+        if self._held:
+            self._held = False
+            _inflight -= 1
+
+
+def reserve() -> Reservation:
+    """Take a slot now or raise busy(). Call before the handler's first await, so a burst
+    of requests can't all pass the capacity check before any of them is counted."""
+    if not has_capacity():
+        raise busy()
+    return Reservation()
+
+
+def busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server busy, please retry",
+        headers={"Retry-After": os.getenv("RETRY_AFTER", "2")},
+    )
+
+
+async def admission():
+    """FastAPI dependency: reserve a request slot, or fail fast with 503 + Retry-After.
+
+    Only touched from the event loop thread, so a plain counter is enough. A yield
+    dependency exits before a StreamingResponse body runs, so streaming endpoints take a
+    reserve() in the handler and release it when the stream ends.
+    """
+    if not has_capacity():
+        raise busy()
+    with slot():
+        yield
+
+
+def shutdown(wait: bool = False) -> None:
+    for pool in _POOLS.values():
+        pool.shutdown(wait=wait, cancel_futures=True)
+    _POOLS.clear()
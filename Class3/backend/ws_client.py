@@ -0,0 +1,152 @@
+"""Scripted client for /ws/voice: streams a WAV in real time and measures reply latency.
+
+Each run sends the clip in 20 ms chunks at real-time pace, then keeps sending silence so
+the server can detect the end of the utterance. Latency is measured from the end of
+speech (the last chunk whose energy is above the silence level was sent) to the first
+audio frame of the reply; the time to the final transcript is reported too.
+
+Usage:
+  python ws_client.py --url ws://127.0.0.1:8000/ws/voice --audio sample.wav --runs 5
+  python ws_client.py --audio sample.wav --codec opus --session bench-1
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import struct
+import threading
+import time
+import uuid
+import wave
+from typing import List, Optional, Tuple
+
+import numpy as np
+from websockets.sync.client import connect
+
+_CHUNK_MS = 20
+
+
+def _load_pcm(path: str) -> Tuple[np.ndarray, int]:
+    """16-bit mono samples and sample rate (stereo is averaged)."""
+    with wave.open(path, "rb") as w:
+        if w.getsampwidth() != 2:
+            raise SystemExit(f"{path}: only 16-bit PCM WAV is supported")
+        pcm = np.frombuffer(w.readframes(w.getnframes()), dtype="<i2")
+        if w.getnchannels() > 1:
+            pcm = pcm.reshape(-1, w.getnchannels()).mean(axis=1).astype("<i2")
+        return pcm, w.getframerate()
+
+
+def _decode_frame(data: bytes) -> Tuple[dict, bytes]:
+    (hlen,) = struct.unpack_from(">I", data, 0)
+    header = json.loads(data[4:4 + hlen].decode("utf-8"))
+    (plen,) = struct.unpack_from(">I", data, 4 + hlen)
+    return header, data[8 + hlen:8 + hlen + plen]
+
+
+def _last_speech_chunk(pcm: np.ndarray, chunk: int, silence_db: float) -> int:
+    n = max(1, -(-len(pcm) // chunk))
+    last = 0
+    for i in range(n):
+        x = pcm[i * chunk:(i + 1) * chunk].astype(np.float32) / 32768.0
+        if len(x) and 10 * np.log10(float(np.mean(x * x)) + 1e-10) > silence_db:
+            last = i
+    return last
+
+
+def run_once(url: str, pcm: np.ndarray, sr: int, session: str, codec: str,
+             silence_db: float, timeout: float) -> dict:
+    chunk = sr * _CHUNK_MS // 1000
+    last_speech = _last_speech_chunk(pcm, chunk, silence_db)
+    marks = {}
+    done = threading.Event()
+    result = {"partials": 0, "text": "", "reply": "", "audio_bytes": 0}
+
+    with connect(f"{url}?session_id={session}&sample_rate={sr}&codec={codec}", max_size=None) as ws:
+        def receive():
+            try:
+                for message in ws:
+                    header, payload = _decode_frame(message)
+                    now = time.perf_counter()
+                    if header["type"] == "partial":
+                        result["partials"] += 1
+                    elif header["type"] == "user_text":
+                        marks.setdefault("user_text", now)
+                        result["text"] = header["text"]
+                    elif header["type"] == "audio":
+                        marks.setdefault("first_audio", now)
+                        result["audio_bytes"] += len(payload)
+                    elif header["type"] in ("end", "busy"):
+                        marks["end"] = now
+                        result["reply"] = header.get("text", header["type"])
+                        break
+            finally:
+                done.set()
+
+        reader = threading.Thread(target=receive, daemon=True)
+        reader.start()
+
+        t0 = time.perf_counter()
+        silence = np.zeros(chunk, dtype="<i2").tobytes()
+        sent = 0
+        while not done.is_set() and time.perf_counter() - t0 < timeout:
+            i = sent
+            data = pcm[i * chunk:(i + 1) * chunk].tobytes() if i * chunk < len(pcm) else silence
+            ws.send(data)
+            if i == last_speech:
+                marks["end_of_speech"] = time.perf_counter()
+            sent += 1
+            # Real-time pacing against the start time, so sleep jitter doesn't accumulate.
+            delay = t0 + sent * _CHUNK_MS / 1000 - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        done.wait(max(0.0, timeout - (time.perf_counter() - t0)))
+
+    eos = marks.get("end_of_speech")
+
+    def since_eos(key: str) -> Optional[float]:
+        return marks[key] - eos if eos is not None and key in marks else None
+
+    result.update(
+        eos_to_text_s=since_eos("user_text"),
+        eos_to_first_audio_s=since_eos("first_audio"),
+        eos_to_end_s=since_eos("end"),
+    )
+    return result
+
+
+def _fmt(x: Optional[float]) -> str:
+    return f"{x * 1000:7.0f}ms" if x is not None else "      n/a"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="ws://127.0.0.1:8000/ws/voice")
+    ap.add_argument("--audio", required=True, help="16-bit PCM WAV with one utterance")
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--codec", default="wav", choices=["wav", "flac", "opus"])
+    ap.add_argument("--session", default=None, help="session id (default: a new one per run)")
+    ap.add_argument("--silence-db", type=float, default=-45.0, help="energy below this is not speech")
+    ap.add_argument("--timeout", type=float, default=120.0)
+    args = ap.parse_args()
+
+    pcm, sr = _load_pcm(args.audio)
+    first_audio: List[float] = []
+    for run in range(args.runs):
+        session = args.session or f"ws-{uuid.uuid4().hex[:8]}"
+        r = run_once(args.url, pcm, sr, session, args.codec, args.silence_db, args.timeout)
+        print(f"run {run}: transcript {_fmt(r['eos_to_text_s'])}  first audio {_fmt(r['eos_to_first_audio_s'])}"
+              f"  done {_fmt(r['eos_to_end_s'])}  partials={r['partials']}  audio={r['audio_bytes']}B")
+        print(f"        user: {r['text']!r}\n        reply: {r['reply']!r}")
+        if r["eos_to_first_audio_s"] is not None:
+            first_audio.append(r["eos_to_first_audio_s"])
+
+    if first_audio:
+        first_audio.sort()
+        print(f"end-of-speech -> first audio: p50 {statistics.median(first_audio) * 1000:.0f}ms, "
+              f"max {first_audio[-1] * 1000:.0f}ms over {len(first_audio)} runs")
+
+
+if __name__ == "__main__":
+    main()
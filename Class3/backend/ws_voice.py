@@ -0,0 +1,228 @@
+"""/ws/voice: full-duplex voice session over a WebSocket.
+
+The client streams raw PCM while the user talks; the server transcribes a sliding window
+of the utterance as it grows (partial transcripts), detects end of utterance from the
+signal energy, and then runs the same LLM -> TTS sentence pipeline as /chat/stream,
+sending the audio back on the same socket while still receiving the next utterance.
+
+Query parameters: ``session_id`` (default: default), ``sample_rate`` of the incoming PCM
+(default: 16000) and ``codec`` for reply audio (wav|flac|opus, default: wav).
+
+Client -> server:
+  binary : 16-bit little-endian mono PCM at ``sample_rate``, any chunk size
+  text   : {"type": "eou"} forces end of utterance (push-to-talk clients)
+
+Server -> client: one framing.py frame per binary message, payload empty unless audio:
+  {"type": "partial", "text": ...}            while the user is speaking
+  {"type": "user_text", "text": ...}          final transcript of the utterance
+  {"type": "audio", "index": i, "text": sentence, "format": ..., ...} + audio   (repeated)
+  {"type": "end", "text": full_reply}
+  {"type": "busy", "retry_after": s}          utterance dropped, server over MAX_INFLIGHT
+  {"type": "error", "detail": ...}            a text message that isn't a JSON object
+
+A ``sample_rate`` <= 0 is refused: the socket is closed with code 1008 (policy violation).
+
+Env:
+  WS_PARTIAL_MS     : new speech between partial transcripts, 0 disables (default: 1000)
+  WS_WINDOW_S       : length of the partial-transcript window (default: 10)
+  WS_EOU_SILENCE_MS : trailing silence that ends an utterance (default: 600)
+  WS_MAX_UTTERANCE_S: force end of utterance after this much audio (default: 30)
+  WS_CALIBRATE_MS   : initial audio used only to measure the noise floor (default: 300)
+  WS_NOISE_WINDOW_S / WS_NOISE_PERCENTILE : noise floor = this percentile of the frame
+                      energies over this window (default: 5, 10)
+  ASR_VAD_MARGIN_DB / ASR_VAD_MIN_DB : speech threshold, shared with asr.py
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from collections import deque
+from typing import Deque, List, Optional
+
+import numpy as np
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+import asr
+import workers
+from framing import encode_frame
+from memory import get_history, push_turn
+from streaming import speak
+from workers import run_stage
+
+router = APIRouter()
+
+_SR = 16000
+_FRAME = 480          # 30 ms at 16 kHz, same as the batch VAD in asr.py
+_PREROLL_FRAMES = 10  # keep 300 ms before the speech onset
+
+
+class _Endpointer:
+    """Streaming energy endpointer.
+
+    The noise floor is a low percentile (WS_NOISE_PERCENTILE) of the frame energies of the
+    last WS_NOISE_WINDOW_S, updated on every frame, speech or not. Steady background noise
+    therefore becomes the floor even when it starts above the speech threshold, while the
+    pauses between words keep it from rising with the speech. No speech is reported during
+    the first WS_CALIBRATE_MS, which only seeds the floor. A frame is speech when it is
+    ASR_VAD_MARGIN_DB above the floor (and above ASR_VAD_MIN_DB).
+    """
+
+    def __init__(self):
+        self.min_db = float(os.getenv("ASR_VAD_MIN_DB", "-50"))
+        self.margin_db = float(os.getenv("ASR_VAD_MARGIN_DB", "12"))
+        self.eou_frames = int(os.getenv("WS_EOU_SILENCE_MS", "600")) * _SR // 1000 // _FRAME
+        self.calibrate_frames = int(os.getenv("WS_CALIBRATE_MS", "300")) * _SR // 1000 // _FRAME
+        self.percentile = float(os.getenv("WS_NOISE_PERCENTILE", "10"))
+        self.history: Deque[float] = deque(maxlen=int(float(os.getenv("WS_NOISE_WINDOW_S", "5")) * _SR / _FRAME))
+        self.noise_db = self.min_db
+        self.in_speech = False
+        self.silent = 0
+
+    def push(self, energy_db: float) -> Optional[str]:
+        """Feed one frame's energy; returns "start", "end" or None."""
+        self.history.append(energy_db)
+        self.noise_db = float(np.percentile(self.history, self.percentile))
+        if len(self.history) <= self.calibrate_frames:
+            return None
+        speech = energy_db > max(self.min_db, self.noise_db + self.margin_db)
+        if not self.in_speech:
+            if speech:
+                self.in_speech, self.silent = True, 0
+                return "start"
+            return None
+        self.silent = 0 if speech else self.silent + 1
+        if self.silent >= self.eou_frames:
+            self.in_speech = False
+            return "end"
+        return None
+
+
+class _Session:
+    def __init__(self, ws: WebSocket, session_id: str, sample_rate: int, codec: str):
+        self.ws = ws
+        self.session_id = session_id
+        self.sample_rate = sample_rate
+        self.codec = codec
+        self.endpointer = _Endpointer()
+        # Stateful across chunks: no zero-padded boundaries, no length drift.
+        self.resampler = asr.StreamResampler(sample_rate, _SR) if sample_rate != _SR else None
+        self.pending = np.zeros(0, dtype=np.float32)   # 16 kHz samples not yet framed
+        self.preroll: Deque[np.ndarray] = deque(maxlen=_PREROLL_FRAMES)
+        self.utterance: List[np.ndarray] = []
+        self.since_partial = 0
+        self.partial_task: Optional[asyncio.Task] = None
+        self.utterances: "asyncio.Queue[np.ndarray]" = asyncio.Queue()
+        self.send_lock = asyncio.Lock()
+        self.partial_every = int(os.getenv("WS_PARTIAL_MS", "1000")) * _SR // 1000
+        self.window = int(float(os.getenv("WS_WINDOW_S", "10")) * _SR)
+        self.max_len = int(float(os.getenv("WS_MAX_UTTERANCE_S", "30")) * _SR)
+
+    async def send(self, header: dict, payload: bytes = b"") -> None:
+        async with self.send_lock:  # partials and replies are sent from different tasks
+            await self.ws.send_bytes(encode_frame(header, payload))
+
+    # ---- receive side: framing, endpointing, partial transcripts ----
+
+    def feed(self, pcm: bytes) -> None:
+        samples = np.frombuffer(pcm[:len(pcm) // 2 * 2], dtype="<i2").astype(np.float32) / 32768.0
+        if self.resampler is not None:
+            samples = self.resampler.process(samples)
+        buf = np.concatenate((self.pending, samples))
+        n = len(buf) // _FRAME
+        self.pending = buf[n * _FRAME:]
+        if n == 0:
+            return
+        frames = buf[:n * _FRAME].reshape(n, _FRAME)
+        energy_db = 10.0 * np.log10(np.einsum("ij,ij->i", frames, frames) / _FRAME + 1e-10)
+        for frame, db in zip(frames, energy_db):
+            event = self.endpointer.push(float(db))
+            if event == "start":
+                self.utterance = list(self.preroll)
+                self.since_partial = 0
+            if self.endpointer.in_speech or event == "end":
+                self.utterance.append(frame)
+                self.since_partial += _FRAME
+            else:
+                self.preroll.append(frame)
+            if event == "end" or len(self.utterance) * _FRAME >= self.max_len:
+                self.end_utterance()
+            elif self.endpointer.in_speech and self.partial_every and self.since_partial >= self.partial_every:
+                self.maybe_partial()
+
+    def end_utterance(self) -> None:
+        if self.utterance:
+            self.utterances.put_nowait(np.concatenate(self.utterance))
+        self.utterance = []
+        self.endpointer.in_speech = False
+        self.preroll.clear()
+
+    def maybe_partial(self) -> None:
+        if self.partial_task is not None and not self.partial_task.done():
+            return  # one partial at a time; the next one covers the newer audio
+        self.since_partial = 0
+        window = np.concatenate(self.utterance)[-self.window:]
+        self.partial_task = asyncio.ensure_future(self._partial(window))
+
+    async def _partial(self, window: np.ndarray) -> None:
+        text = await run_stage("asr", asr.transcribe_array, window)
+        if text and self.utterance:  # skip partials that arrive after the utterance ended
+            await self.send({"type": "partial", "text": text})
+
+    # ---- reply side: one utterance at a time ----
+
+    async def respond(self) -> None:
+        while True:
+            audio = await self.utterances.get()
+            if not workers.has_capacity():
+                await self.send({"type": "busy", "retry_after": float(os.getenv("RETRY_AFTER", "2"))})
+                continue
+            with workers.slot():
+                user_text = await run_stage("asr", asr.transcribe_array, audio)
+                if not user_text:
+                    continue  # energy, but no words
+                await self.send({"type": "user_text", "text": user_text})
+                history = await asyncio.to_thread(get_history, self.session_id)
+                sentences = []
+                async for index, sentence, payload, info in speak(user_text, history, self.codec, session_id=self.session_id):
+                    sentences.append(sentence)
+                    await self.send({"type": "audio", "index": index, "text": sentence, **info}, payload)
+                assistant_text = " ".join(sentences)
+                await asyncio.to_thread(push_turn, self.session_id, user_text, assistant_text)
+                await self.send({"type": "end", "text": assistant_text})
+
+
+@router.websocket("/ws/voice")
+async def ws_voice(ws: WebSocket, session_id: str = "default", sample_rate: int = _SR, codec: str = "wav"):
+    await ws.accept()
+    if sample_rate <= 0:
+        await ws.close(code=1008, reason="sample_rate must be positive")
+        return
+    session = _Session(ws, session_id, sample_rate, codec)
+    responder = asyncio.ensure_future(session.respond())
+    try:
+        while True:
+            message = await ws.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                session.feed(message["bytes"])
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except json.JSONDecodeError as e:
+                    await session.send({"type": "error", "detail": f"invalid JSON: {e}"})
+                    continue
+                if not isinstance(control, dict):
+                    await session.send({"type": "error", "detail": "expected a JSON object"})
+                    continue
+                if control.get("type") == "eou":
+                    session.end_utterance()
+            if responder.done():
+                responder.result()  # surface reply-side errors
+    except WebSocketDisconnect:
+        pass
+    finally:
+        responder.cancel()
+        if session.partial_task is not None:
+            session.partial_task.cancel()
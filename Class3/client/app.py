@@ -1,15 +1,51 @@
 import gradio as gr
 import requests
 import io
+import json
 import base64
-import tempfile
+import struct
+import numpy as np
+import soundfile as sf
 
 BACKEND_URL = "http://127.0.0.1:8000/chat"
+# Framed binary reply (see backend/framing.py); codec=wav|flac|opus
+ACCEPT = "application/x-voice-frames; codec=flac, application/json;q=0.5, audio/wav;q=0.5"
+FRAMES_MEDIA_TYPE = "application/x-voice-frames"
+
+def iter_frames(data):
+    """Yield (header, payload) from a length-prefixed frame stream."""
+    view = memoryview(data)
+    pos = 0
+    while pos < len(view):
+        (hlen,) = struct.unpack_from(">I", view, pos)
+        header = json.loads(bytes(view[pos + 4:pos + 4 + hlen]).decode("utf-8"))
+        pos += 4 + hlen
+        (plen,) = struct.unpack_from(">I", view, pos)
+        pos += 4
+        yield header, view[pos:pos + plen]
+        pos += plen
+
+def decode_audio(payload):
+    """WAV/FLAC/Opus bytes -> (sample_rate, int16 numpy array) for gr.Audio, in memory."""
+    y, sr = sf.read(io.BytesIO(payload), dtype="int16")
+    return sr, y
+
+def parse_frames(data):
+    text, segments = "", []
+    for header, payload in iter_frames(data):
+        if header["type"] == "audio":
+            segments.append(decode_audio(payload))
+        elif header["type"] == "end":
+            text = header["text"]
+    if not segments:
+        return None, text
+    sr = segments[0][0]
+    return (sr, np.concatenate([y for _, y in segments])), text
 
 def send_audio(mic_audio, file_audio, text_override, session_id):
     files = {}
     data = {}
-    headers = {"X-Session-ID": session_id or "default"}
+    headers = {"X-Session-ID": session_id or "default", "Accept": ACCEPT}
 
     if text_override and text_override.strip():
         data["text"] = text_override.strip()
@@ -22,7 +58,6 @@ def send_audio(mic_audio, file_audio, text_override, session_id):
                 files["file"] = ("audio.mp3", f.read(), "audio/mpeg")
         else:
             sr, y = audio
-            import soundfile as sf
             buf = io.BytesIO()
             sf.write(buf, y, samplerate=sr, format="WAV")
             buf.seek(0)
@@ -32,28 +67,25 @@ def send_audio(mic_audio, file_audio, text_override, session_id):
         resp = requests.post(BACKEND_URL, files=files if files else None, data=data if data else None, headers=headers, timeout=120)
         resp.raise_for_status()
         
-        # Parse JSON response
+        content_type = resp.headers.get("Content-Type", "")
+        if content_type.startswith(FRAMES_MEDIA_TYPE):
+            audio, assistant_text = parse_frames(resp.content)
+            print(f"[CLIENT DEBUG] Framed reply: {len(resp.content)} bytes, text: '{assistant_text}'")
+            return audio, assistant_text, ""
+        if content_type.startswith("audio/"):
+            # Older backend: WAV body, text in a URL-encoded header
+            import urllib.parse
+            assistant_text = urllib.parse.unquote(resp.headers.get("X-Assistant-Text", ""))
+            return decode_audio(resp.content), assistant_text, ""
+
+        # Older backend: JSON with a base64 data URI
         response_data = resp.json()
-        print(f"[CLIENT DEBUG] JSON response: {response_data}")
-        
-        # Extract text
         assistant_text = response_data.get("text", "No text received")
         print(f"[CLIENT DEBUG] Assistant text: '{assistant_text}'")
-        
-        # Extract and decode audio
         audio_url = response_data.get("audio_url", "")
         if audio_url.startswith("data:audio/wav;base64,"):
-            # Decode base64 audio
-            audio_base64 = audio_url.replace("data:audio/wav;base64,", "")
-            audio_bytes = base64.b64decode(audio_base64)
-            
-            # Save to temp file for gradio
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
-                tmp_file.write(audio_bytes)
-                audio_path = tmp_file.name
-            
-            print(f"[CLIENT DEBUG] Saved audio to: {audio_path}")
-            return audio_path, assistant_text, ""
+            audio_bytes = base64.b64decode(audio_url[len("data:audio/wav;base64,"):])
+            return decode_audio(audio_bytes), assistant_text, ""
         else:
             return None, assistant_text, "Error: Invalid audio data"
             